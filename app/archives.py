@@ -0,0 +1,254 @@
+"""Read ZIP and TAR archives in S3 through ranged reads.
+
+``read(start, end)`` returns the bytes of an inclusive range of the object.
+A ZIP index costs one suffix read for the end-of-central-directory record
+(plus one for the central directory when it is larger than that read). A
+TAR index walks the 512-byte headers, reading a window at each header and
+jumping over member data, so large members are never fetched.
+"""
+
+import collections
+import datetime
+import struct
+import threading
+import zlib
+
+TAIL_BYTES = 64 * 1024 + 22 + 20 + 56
+TAR_BLOCK = 512
+ZIP_EXTENSIONS = (".zip", ".jar", ".war", ".whl", ".apk", ".nupkg")
+TAR_EXTENSIONS = (".tar",)
+STORED = 0
+DEFLATED = 8
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_kind(key):
+    lower = key.lower()
+    if lower.endswith(ZIP_EXTENSIONS):
+        return "zip"
+    if lower.endswith(TAR_EXTENSIONS):
+        return "tar"
+    return None
+
+
+def dos_to_datetime(dos_date, dos_time):
+    try:
+        return datetime.datetime(
+            1980 + (dos_date >> 9), (dos_date >> 5) & 0xF, dos_date & 0x1F,
+            dos_time >> 11, (dos_time >> 5) & 0x3F, (dos_time & 0x1F) * 2,
+        )
+    except ValueError:
+        return None
+
+
+def _zip64_extra(extra, usize, csize, offset):
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<HH", extra, pos)
+        if tag == 0x0001:
+            field = pos + 4
+            values = []
+            for current in (usize, csize, offset):
+                if current == 0xFFFFFFFF and field + 8 <= pos + 4 + length:
+                    values.append(struct.unpack_from("<Q", extra, field)[0])
+                    field += 8
+                else:
+                    values.append(current)
+            return tuple(values)
+        pos += 4 + length
+    return usize, csize, offset
+
+
+def read_zip_index(read, size, max_index_bytes):
+    if size < 22:
+        raise ArchiveError("Not a ZIP archive")
+    tail_start = max(0, size - TAIL_BYTES)
+    tail = read(tail_start, size - 1)
+    eocd = tail.rfind(b"PK\x05\x06")
+    if eocd == -1 or eocd + 22 > len(tail):
+        raise ArchiveError("End of central directory not found")
+    _, _, _, count, cd_size, cd_offset, _ = struct.unpack_from("<HHHHIIH", tail, eocd + 4)
+    locator = eocd - 20
+    if locator >= 0 and tail[locator:locator + 4] == b"PK\x06\x07":
+        eocd64_offset = struct.unpack_from("<Q", tail, locator + 8)[0]
+        pos = eocd64_offset - tail_start
+        record = tail[pos:pos + 56] if pos >= 0 else read(eocd64_offset, eocd64_offset + 55)
+        if record[:4] != b"PK\x06\x06":
+            raise ArchiveError("Bad ZIP64 end of central directory")
+        count, cd_size, cd_offset = struct.unpack_from("<QQQ", record, 32)
+    if cd_size > max_index_bytes:
+        raise ArchiveError("Central directory is too large")
+    if cd_offset >= tail_start:
+        directory = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+    else:
+        directory = read(cd_offset, cd_offset + cd_size - 1) if cd_size else b""
+    entries = []
+    pos = 0
+    while pos + 46 <= len(directory) and len(entries) < count:
+        if directory[pos:pos + 4] != b"PK\x01\x02":
+            raise ArchiveError("Bad central directory entry")
+        (flags, method, dos_time, dos_date, crc, csize, usize,
+         name_len, extra_len, comment_len, _, _, _, offset) = struct.unpack_from("<HHHHIIIHHHHHII", directory, pos + 8)
+        name_raw = directory[pos + 46:pos + 46 + name_len]
+        extra = directory[pos + 46 + name_len:pos + 46 + name_len + extra_len]
+        usize, csize, offset = _zip64_extra(extra, usize, csize, offset)
+        name = name_raw.decode("utf-8" if flags & 0x0800 else "cp437", errors="replace")
+        entries.append({
+            "name": name,
+            "size": usize,
+            "compressed": csize,
+            "method": method,
+            "encrypted": bool(flags & 0x0001),
+            "crc": crc,
+            "offset": offset,
+            "is_dir": name.endswith("/"),
+            "is_file": not name.endswith("/"),
+            "modified": dos_to_datetime(dos_date, dos_time),
+        })
+        pos += 46 + name_len + extra_len + comment_len
+    return entries
+
+
+def zip_data_span(read, entry):
+    """Return ``(start, length)`` of a member's compressed bytes, from its local header."""
+    header = read(entry["offset"], entry["offset"] + 29)
+    if header[:4] != b"PK\x03\x04":
+        raise ArchiveError("Bad local file header")
+    name_len, extra_len = struct.unpack_from("<HH", header, 26)
+    return entry["offset"] + 30 + name_len + extra_len, entry["compressed"]
+
+
+def inflate(chunks):
+    decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = decoder.decompress(chunk)
+        if data:
+            yield data
+    data = decoder.flush()
+    if data:
+        yield data
+
+
+def _tar_number(field):
+    if field[:1] and field[0] & 0x80:
+        # GNU base-256 encoding for sizes of 8 GiB and more.
+        value = field[0] & 0x7F
+        for byte in field[1:]:
+            value = (value << 8) | byte
+        return value
+    text = field.split(b"\0", 1)[0].strip()
+    return int(text, 8) if text else 0
+
+
+def _pax_records(data):
+    records = {}
+    pos = 0
+    while pos < len(data):
+        space = data.find(b" ", pos)
+        if space == -1:
+            break
+        length = int(data[pos:space])
+        if length <= 0:
+            break
+        key, _, value = data[space + 1:pos + length - 1].partition(b"=")
+        records[key.decode("utf-8", errors="replace")] = value.decode("utf-8", errors="replace")
+        pos += length
+    return records
+
+
+def read_tar_index(read, size, max_entries, window=64 * 1024):
+    """List a TAR archive; returns ``(entries, complete)``."""
+    entries = []
+    buf = b""
+    buf_start = 0
+    offset = 0
+    long_name = None
+    pax = {}
+
+    def block(at, length):
+        nonlocal buf, buf_start
+        if not (buf_start <= at and at + length <= buf_start + len(buf)):
+            buf = read(at, min(size, at + max(window, length)) - 1)
+            buf_start = at
+        return buf[at - buf_start:at - buf_start + length]
+
+    while offset + TAR_BLOCK <= size:
+        if len(entries) >= max_entries:
+            return entries, False
+        header = block(offset, TAR_BLOCK)
+        if len(header) < TAR_BLOCK or header == b"\0" * TAR_BLOCK:
+            break
+        checksum = _tar_number(header[148:156])
+        if checksum != sum(header[:148]) + 256 + sum(header[156:]):
+            raise ArchiveError("Bad TAR header checksum")
+        member_size = _tar_number(header[124:136])
+        kind = header[156:157]
+        data_start = offset + TAR_BLOCK
+        offset = data_start + -(-member_size // TAR_BLOCK) * TAR_BLOCK
+        if kind in (b"L", b"x", b"g"):
+            extended = block(data_start, member_size) if member_size <= 1024 * 1024 else b""
+            if kind == b"L":
+                long_name = extended.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+            elif kind == b"x":
+                pax = _pax_records(extended)
+            continue
+        name = header[0:100].split(b"\0", 1)[0].decode("utf-8", errors="replace")
+        if header[257:262] == b"ustar":
+            prefix = header[345:500].split(b"\0", 1)[0].decode("utf-8", errors="replace")
+            if prefix:
+                name = prefix + "/" + name
+        name = pax.get("path") or long_name or name
+        if "size" in pax:
+            member_size = int(pax["size"])
+            offset = data_start + -(-member_size // TAR_BLOCK) * TAR_BLOCK
+        mtime = _tar_number(header[136:148])
+        is_dir = kind == b"5" or name.endswith("/")
+        entries.append({
+            "name": name if not is_dir or name.endswith("/") else name + "/",
+            "size": member_size if kind in (b"0", b"\0", b"7") else 0,
+            "compressed": member_size,
+            "method": STORED,
+            "encrypted": False,
+            "offset": data_start,
+            "is_dir": is_dir,
+            "is_file": kind in (b"0", b"\0", b"7"),
+            "modified": datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc) if mtime else None,
+        })
+        long_name = None
+        pax = {}
+    return entries, True
+
+
+class IndexCache:
+    """Parsed archive listings keyed by ``(bucket, key, etag)``, least recently used first out."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cache_key):
+        with self.lock:
+            index = self.entries.get(cache_key)
+            if index is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(cache_key)
+            return index
+
+    def put(self, cache_key, index):
+        with self.lock:
+            self.entries[cache_key] = index
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,97 @@
+"""Operation audit trail for S3 File Manager.
+
+Request threads only append a row to an in-memory buffer. One writer thread
+hands the buffer to ``insert(rows)`` every ``flush_ms`` milliseconds, or as
+soon as ``batch_rows`` rows are waiting, so a mutation never waits on the
+database. Rows whose insert fails are put back for the next flush; past
+``max_rows`` pending rows the oldest are dropped and counted. The same thread
+calls ``sweep()`` every ``sweep_seconds`` to delete expired rows.
+"""
+
+import atexit
+import collections
+import datetime
+import logging
+import socket
+import threading
+import time
+
+FIELDS = ("at", "user_id", "node", "client", "action", "bucket", "key", "target", "size", "status", "detail")
+
+
+class AuditLog:
+    def __init__(self, insert, sweep=None, flush_ms=1000, batch_rows=500, max_rows=50000, sweep_seconds=3600):
+        self.insert = insert
+        self.sweep = sweep
+        self.flush_seconds = max(1, flush_ms) / 1000
+        self.batch_rows = max(1, batch_rows)
+        self.max_rows = max(self.batch_rows, max_rows)
+        self.sweep_seconds = sweep_seconds
+        self.node = socket.gethostname()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.rows = collections.deque()
+        self.written = 0
+        self.dropped = 0
+        self.thread = None
+
+    def record(self, action, user_id=None, bucket=None, key=None, target=None, size=None, status="ok", detail=None, client=None):
+        row = (
+            datetime.datetime.now(datetime.timezone.utc), user_id, self.node, client,
+            action, bucket, key, target, size, status, detail,
+        )
+        with self.lock:
+            self.rows.append(row)
+            if len(self.rows) > self.max_rows:
+                self.rows.popleft()
+                self.dropped += 1
+            full = len(self.rows) >= self.batch_rows
+        if full:
+            self.wake.set()
+
+    def pending(self):
+        with self.lock:
+            return len(self.rows)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="s3fm-audit", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        # The first sweep waits a minute so a fleet restart does not sweep all at once at boot.
+        next_sweep = time.monotonic() + 60
+        while True:
+            self.wake.wait(self.flush_seconds)
+            self.wake.clear()
+            self.flush()
+            if self.sweep and time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self.sweep_seconds
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        logging.info("Audit sweep removed=%s", removed)
+                except Exception as e:
+                    logging.warning("Audit sweep failed: %s", e)
+
+    def flush(self):
+        with self.flush_lock:
+            while True:
+                with self.lock:
+                    batch = [self.rows.popleft() for _ in range(min(self.batch_rows, len(self.rows)))]
+                if not batch:
+                    return
+                try:
+                    self.insert(batch)
+                except Exception as e:
+                    logging.warning("Audit flush failed rows=%s: %s", len(batch), e)
+                    with self.lock:
+                        self.rows.extendleft(reversed(batch))
+                        while len(self.rows) > self.max_rows:
+                            self.rows.popleft()
+                            self.dropped += 1
+                    return
+                self.written += len(batch)
@@ -0,0 +1,171 @@
+"""Line search inside S3 objects for S3 File Manager.
+
+Plain objects are split into byte ranges that are fetched and searched on a
+thread pool. A range owns the lines that start inside it: the fragment
+before its first newline belongs to the line started by the previous range,
+so the consumer stitches ``previous tail + next head`` and checks that line
+itself. Results come out in offset order. Gzip objects cannot be split and are
+decompressed as a stream instead.
+"""
+
+import re
+import threading
+import zlib
+
+MAX_LINE = 1024 * 1024
+MAX_OUTPUT_LINE = 4096
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+
+def compile_pattern(pattern, regex=False, ignore_case=False):
+    source = pattern.encode("utf-8") if regex else re.escape(pattern.encode("utf-8"))
+    # Buffers hold many lines, so ^ and $ have to anchor at newlines.
+    return re.compile(source, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+
+
+def find_lines(pattern, buf, base):
+    """Yield ``(offset, line)`` for each line of ``buf`` with a match; ``base`` is the offset of ``buf``."""
+    pos = 0
+    size = len(buf)
+    while pos < size:
+        m = pattern.search(buf, pos)
+        if not m:
+            return
+        start = buf.rfind(b"\n", 0, m.start()) + 1
+        end = buf.find(b"\n", m.start())
+        if end == -1:
+            end = size
+        line = buf[start:end]
+        # A match that runs over a newline does not count for the line it starts in.
+        if m.end() <= end or pattern.search(line):
+            yield base + start, line
+        pos = end + 1
+
+
+def scan_part(fetch, pattern, start, end, stop):
+    # Returns (head, matches, tail); head is None when the range has no newline.
+    if stop.is_set():
+        return None, [], b""
+    data = fetch(start, end)
+    first = data.find(b"\n")
+    if first == -1:
+        return None, [], data
+    last = data.rfind(b"\n")
+    matches = list(find_lines(pattern, data[first + 1:last], start + first + 1)) if last > first else []
+    return data[:first], matches, data[last + 1:]
+
+
+def gunzip(chunks):
+    decoder = zlib.decompressobj(GZIP_WBITS)
+    for chunk in chunks:
+        data = chunk
+        while data:
+            out = decoder.decompress(data, MAX_LINE)
+            if out:
+                yield out
+            if decoder.eof:
+                # Concatenated gzip members (common for rotated logs).
+                data = decoder.unused_data
+                decoder = zlib.decompressobj(GZIP_WBITS)
+            else:
+                data = decoder.unconsumed_tail
+
+
+class GrepRun:
+    """One search: iterate ``parallel()`` or ``stream()``, then read ``scanned``/``stopped``."""
+
+    def __init__(self, pattern, limit):
+        self.pattern = pattern
+        self.limit = limit
+        self.found = 0
+        self.scanned = 0
+        self.stopped = False
+        self.carry = b""
+        self.carry_offset = 0
+        self.stop = threading.Event()
+
+    def _line(self, offset, line):
+        self.found += 1
+        if self.found >= self.limit:
+            self.stopped = True
+            self.stop.set()
+        return offset, line
+
+    def _extend(self, fragment):
+        # Lines longer than MAX_LINE are only searched in their first MAX_LINE bytes.
+        room = MAX_LINE - len(self.carry)
+        if room > 0:
+            self.carry += fragment[:room]
+
+    def _close_line(self, fragment, next_offset):
+        self._extend(fragment)
+        line = self.carry
+        offset = self.carry_offset
+        self.carry = b""
+        self.carry_offset = next_offset
+        if self.pattern.search(line):
+            return self._line(offset, line)
+        return None
+
+    def _finish(self):
+        if self.carry and not self.stopped:
+            hit = self._close_line(b"", self.scanned)
+            if hit:
+                yield hit
+
+    def parallel(self, pool, fetch, size, part_size, window):
+        """Search ``size`` bytes read by ``fetch(start, end)`` in ``part_size`` ranges."""
+        bounds = [(start, min(size, start + part_size) - 1) for start in range(0, size, part_size)]
+        pending = []
+        next_part = 0
+        try:
+            while next_part < len(bounds) or pending:
+                while next_part < len(bounds) and len(pending) < window:
+                    start, end = bounds[next_part]
+                    pending.append((start, end, pool.submit(scan_part, fetch, self.pattern, start, end, self.stop)))
+                    next_part += 1
+                start, end, future = pending.pop(0)
+                head, matches, tail = future.result()
+                self.scanned = end + 1
+                if head is None:
+                    self._extend(tail)
+                    continue
+                hit = self._close_line(head, start + len(head) + 1)
+                if hit:
+                    yield hit
+                for offset, line in matches:
+                    if self.stopped:
+                        return
+                    yield self._line(offset, line)
+                if self.stopped:
+                    return
+                self.carry_offset = end + 1 - len(tail)
+                self._extend(tail)
+            yield from self._finish()
+        finally:
+            self.stop.set()
+            for _, _, future in pending:
+                future.cancel()
+
+    def stream(self, chunks):
+        """Search a sequential byte stream, e.g. ``gunzip(body chunks)``."""
+        for data in chunks:
+            buf_offset = self.scanned
+            self.scanned += len(data)
+            last = data.rfind(b"\n")
+            if last == -1:
+                self._extend(data)
+                continue
+            first = data.find(b"\n")
+            hit = self._close_line(data[:first], buf_offset + first + 1)
+            if hit:
+                yield hit
+            if self.stopped:
+                return
+            for offset, line in find_lines(self.pattern, data[first + 1:last], buf_offset + first + 1):
+                yield self._line(offset, line)
+                if self.stopped:
+                    return
+            self.carry_offset = buf_offset + last + 1
+            self._extend(data[last + 1:])
+        yield from self._finish()
@@ -0,0 +1,276 @@
+"""Listing page cache and speculative prefetch for S3 File Manager."""
+
+import collections
+import logging
+import threading
+import time
+
+PAGE_FIELDS = ("CommonPrefixes", "Contents", "IsTruncated", "NextContinuationToken", "KeyCount")
+
+
+class PrefixIndex:
+    """Cache keys grouped by bucket and listing prefix; callers hold their own lock.
+
+    A write to ``key`` affects the entries whose prefix ``key`` starts with,
+    so ``pop`` looks those prefixes up directly instead of scanning every
+    entry. A folder operation passes its folder with ``subtree`` to also
+    drop everything below it, once for the whole operation.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+
+    def add(self, bucket, prefix, key):
+        self.buckets.setdefault(bucket, {}).setdefault(prefix, set()).add(key)
+
+    def discard(self, bucket, prefix, key):
+        prefixes = self.buckets.get(bucket)
+        keys = prefixes.get(prefix) if prefixes else None
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del prefixes[prefix]
+            if not prefixes:
+                del self.buckets[bucket]
+
+    def pop(self, bucket, key, subtree=False):
+        """Remove and return the keys under every prefix of ``key`` (and under ``key`` with ``subtree``)."""
+        prefixes = self.buckets.get(bucket)
+        if not prefixes:
+            return []
+        if subtree or len(prefixes) <= len(key):
+            matched = [p for p in prefixes if key.startswith(p) or (subtree and p.startswith(key))]
+        else:
+            matched = [key[:end] for end in range(len(key) + 1) if key[:end] in prefixes]
+        found = []
+        for prefix in matched:
+            found.extend(prefixes.pop(prefix))
+        if not prefixes:
+            del self.buckets[bucket]
+        return found
+
+
+class ListingCache:
+    """Recent ``list_objects_v2`` pages, keyed by ``(scope, bucket, prefix, token, max, start_after)``.
+
+    ``scope`` keeps users apart even when they share a bucket. Every bucket
+    has a generation number that ``invalidate`` bumps; a page listed under an
+    older generation is not stored, so a LIST racing a write cannot put the
+    pre-write page back.
+    """
+
+    def __init__(self, ttl=15, max_entries=2000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.index = PrefixIndex()
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _drop_locked(self, key):
+        self.entries.pop(key, None)
+        self.index.discard(key[1], key[2], key)
+
+    def generation(self, bucket):
+        with self.lock:
+            return self.generations.get(bucket, 0)
+
+    def _fresh_locked(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            self._drop_locked(key)
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._fresh_locked(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def contains(self, key):
+        with self.lock:
+            return self._fresh_locked(key) is not None
+
+    def put(self, key, resp, generation):
+        if not self.enabled:
+            return
+        page = {field: resp[field] for field in PAGE_FIELDS if field in resp}
+        with self.lock:
+            if self.generations.get(key[1], 0) != generation:
+                return
+            self.entries.pop(key, None)
+            self.entries[key] = (time.time(), page)
+            self.index.add(key[1], key[2], key)
+            while len(self.entries) > self.max_entries:
+                self._drop_locked(next(iter(self.entries)))
+
+    def invalidate(self, bucket, key, subtree=False):
+        # A key shows up in the listing of every prefix it starts with (as an
+        # object directly below it, or inside one of its CommonPrefixes).
+        with self.lock:
+            self.generations[bucket] = self.generations.get(bucket, 0) + 1
+            for k in self.index.pop(bucket, key, subtree):
+                self.entries.pop(k, None)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class ListingPrefetcher:
+    """Warms ``cache`` with the pages a user is likely to open next.
+
+    After a listing is served, ``schedule`` lists the next continuation page
+    and the first ``children`` sub-folders in the background, ranked by how
+    often this user opened them before. At most ``budget`` prefetches run at
+    once across all requests; anything beyond that is skipped rather than
+    queued, and a page that is cached or already being fetched is not
+    fetched twice.
+    """
+
+    def __init__(self, cache, pool, budget, children=3, max_users=1000, max_prefixes=500):
+        self.cache = cache
+        self.pool = pool
+        self.children = children
+        self.max_users = max_users
+        self.max_prefixes = max_prefixes
+        self.slots = threading.BoundedSemaphore(max(1, budget))
+        self.lock = threading.Lock()
+        self.inflight = set()
+        self.history = collections.OrderedDict()
+        self.started = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.children > 0 and self.cache.enabled
+
+    def visit(self, scope, prefix):
+        with self.lock:
+            counts = self.history.pop(scope, None) or collections.Counter()
+            counts[prefix] += 1
+            if len(counts) > self.max_prefixes:
+                counts = collections.Counter(dict(counts.most_common(self.max_prefixes // 2)))
+            self.history[scope] = counts
+            while len(self.history) > self.max_users:
+                self.history.popitem(last=False)
+
+    def rank(self, scope, prefixes):
+        with self.lock:
+            counts = dict(self.history.get(scope) or {})
+        order = sorted(range(len(prefixes)), key=lambda i: (-counts.get(prefixes[i], 0), i))
+        return [prefixes[i] for i in order]
+
+    def schedule(self, scope, bucket, prefix, folders, next_token, max_keys, fetch):
+        """Prefetch the next page and the top-ranked child folders.
+
+        ``fetch(prefix, token)`` returns one ``list_objects_v2`` page.
+        """
+        if not self.enabled:
+            return
+        targets = []
+        if next_token:
+            targets.append((prefix, next_token))
+        targets.extend((child, "") for child in self.rank(scope, folders)[:self.children])
+        for target_prefix, token in targets:
+            self._warm((scope, bucket, target_prefix, token, max_keys, ""), fetch)
+
+    def _warm(self, key, fetch):
+        with self.lock:
+            if key in self.inflight or self.cache.contains(key):
+                return
+            if not self.slots.acquire(blocking=False):
+                self.skipped += 1
+                return
+            self.inflight.add(key)
+            self.started += 1
+        try:
+            self.pool.submit(self._run, key, fetch)
+        except Exception:
+            self._release(key)
+
+    def _run(self, key, fetch):
+        try:
+            generation = self.cache.generation(key[1])
+            resp = fetch(key[2], key[3])
+            self.cache.put(key, resp, generation)
+        except Exception as e:
+            logging.info("Prefetch failed bucket=%s prefix=%s: %s", key[1], key[2], e)
+        finally:
+            self._release(key)
+
+    def _release(self, key):
+        with self.lock:
+            self.inflight.discard(key)
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            return {"started": self.started, "skipped": self.skipped, "inflight": len(self.inflight)}
+
+
+class PageIndex:
+    """Continuation tokens of listing pages already seen, per ``(scope, bucket, prefix, max)``.
+
+    Page 1 needs no token. Listing page N records its ``NextContinuationToken``
+    as the start of page N + 1, so any page reached once (and the pages
+    around it) can be listed again with one LIST call instead of walking the
+    chain from the first page.
+    """
+
+    def __init__(self, max_chains=1000, max_pages=10000):
+        self.max_chains = max_chains
+        self.max_pages = max_pages
+        self.lock = threading.Lock()
+        self.chains = collections.OrderedDict()
+        self.index = PrefixIndex()
+
+    def nearest(self, chain, page):
+        """Return ``(known_page, token)`` for the closest recorded page at or before ``page``."""
+        with self.lock:
+            entry = self.chains.get(chain)
+            if entry is None:
+                return 1, ""
+            self.chains.move_to_end(chain)
+            known = max((p for p in entry["tokens"] if p <= page), default=1)
+            return known, entry["tokens"].get(known, "")
+
+    def last_page(self, chain):
+        with self.lock:
+            entry = self.chains.get(chain)
+            return entry["last"] if entry else None
+
+    def record(self, chain, page, next_token):
+        with self.lock:
+            entry = self.chains.pop(chain, None) or {"tokens": {}, "last": None}
+            self.chains[chain] = entry
+            self.index.add(chain[1], chain[2], chain)
+            if next_token and page < self.max_pages:
+                entry["tokens"][page + 1] = next_token
+                if entry["last"] is not None and entry["last"] <= page:
+                    entry["last"] = None
+            elif not next_token:
+                entry["last"] = page
+            while len(self.chains) > self.max_chains:
+                oldest, _ = self.chains.popitem(last=False)
+                self.index.discard(oldest[1], oldest[2], oldest)
+
+    def invalidate(self, bucket, key, subtree=False):
+        # Writes shift page boundaries, so chains covering the key start over.
+        with self.lock:
+            for chain in self.index.pop(bucket, key, subtree):
+                self.chains.pop(chain, None)
@@ -0,0 +1,286 @@
+"""Parallel recursive listing (keyspace fan-out) for S3 File Manager."""
+
+import heapq
+import itertools
+import queue
+import string
+import threading
+
+DONE = object()
+MAX_SPLIT_DEPTH = 3
+CHAR_CLASSES = [string.digits, string.ascii_uppercase, string.ascii_lowercase]
+FALLBACK_ALPHABET = "".join(sorted(set(string.digits + string.ascii_letters + "-_.")))
+
+
+class ListLimit(Exception):
+    """A walk reached its ``max_lists`` budget; what it yielded is a lower bound."""
+
+
+def start_after_for(bound):
+    # StartAfter is exclusive; pick a string just below ``bound`` so keys equal to it are kept.
+    if not bound or bound[-1] == "\0":
+        return bound[:-1]
+    return bound[:-1] + chr(ord(bound[-1]) - 1) + "\U0010ffff"
+
+
+def split_points(prefix, first, last, upper):
+    """Boundaries for partitioning the keys after ``last`` (and before ``upper``).
+
+    The split happens one character above where the first and last key of
+    the page differ: ``img_00001``/``img_01000`` splits on ``img_1``,
+    ``img_2``, ... The candidate characters share the class (digit, upper,
+    lower) of the current one. Ranges stay contiguous, so keys outside the
+    guessed alphabet still land in the last range.
+    """
+    common = 0
+    limit = min(len(first), len(last))
+    while common < limit and first[common] == last[common]:
+        common += 1
+    stem_len = max(len(prefix), common - 1)
+    if stem_len >= len(last):
+        return []
+    stem = last[:stem_len]
+    current = last[stem_len]
+    alphabet = next((chars for chars in CHAR_CLASSES if current in chars), FALLBACK_ALPHABET)
+    bounds = []
+    for ch in alphabet:
+        bound = stem + ch
+        if bound > last and (upper is None or bound < upper):
+            bounds.append(bound)
+    return bounds
+
+
+class _Task:
+    # One contiguous slice of one folder level: names directly under ``prefix``
+    # that are > ``start_after`` and < ``upper``.
+    def __init__(self, prefix, start_after="", upper=None, depth=0):
+        self.prefix = prefix
+        self.start_after = start_after
+        self.upper = upper
+        self.depth = depth
+        self.out = queue.Queue()
+        self.tail = []
+        self.token = ""
+        self.pages = 0
+
+
+class _Walk:
+    def __init__(self, lister, client, bucket, ordered, descend, max_lists):
+        self.lister = lister
+        self.client = client
+        self.bucket = bucket
+        self.ordered = ordered
+        self.descend = descend
+        self.max_lists = max_lists
+        self.lists = 0
+        self.stopped = False
+        self.lock = threading.Lock()
+        self.running = 0
+        self.shared = queue.Queue(maxsize=lister.buffer_pages)
+        # Ordered walks only: pages listed but not yet read, the task the
+        # consumer is reading, and tasks waiting for it to catch up.
+        self.buffered = 0
+        self.current = None
+        self.parked = {}
+
+    def submit(self, task):
+        with self.lock:
+            self.running += 1
+        self.lister.pool.submit(self.run, task)
+
+    def put(self, item):
+        # Blocks while the consumer is behind, and gives up once it has gone.
+        while not self.stopped:
+            try:
+                self.shared.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def emit(self, task, item):
+        if not self.ordered:
+            self.put(item)
+            return
+        with self.lock:
+            self.buffered += 1
+        task.out.put(item)
+
+    def run(self, task):
+        finished = True
+        try:
+            finished = self.stopped or self.list_task(task)
+        except Exception as e:
+            self.emit(task, ("error", e))
+            if not self.ordered:
+                # The consumer raises it next, so nothing else this walk lists is wanted.
+                self.stopped = True
+        finally:
+            if finished and self.ordered:
+                if task.tail:
+                    self.emit(task, ("page", [("task", segment) for segment in task.tail]))
+                task.out.put(DONE)
+            with self.lock:
+                self.running -= 1
+                idle = self.running == 0
+            if idle and not self.ordered:
+                self.put(DONE)
+
+    def park(self, task):
+        # A worker of an ordered walk never blocks on a full queue: the
+        # consumer reads one task at a time, and the task it needs next may be
+        # waiting for a pool thread. A task that is ahead gives its thread
+        # back instead, and ``resume`` resubmits it.
+        with self.lock:
+            if task is self.current:
+                ahead = task.out.qsize() >= self.lister.buffer_pages
+            else:
+                ahead = self.buffered >= self.lister.buffer_pages
+            if ahead:
+                self.parked[task] = None
+            return ahead
+
+    def resume(self, task, taken=False):
+        """Called by the consumer when it reads from (``taken``) or moves to ``task``."""
+        limit = self.lister.buffer_pages
+        with self.lock:
+            if taken:
+                self.buffered -= 1
+            self.current = task
+            ready = []
+            if task in self.parked and task.out.qsize() < limit:
+                del self.parked[task]
+                ready.append(task)
+            for waiting in list(itertools.islice(self.parked, max(0, limit - self.buffered))):
+                del self.parked[waiting]
+                ready.append(waiting)
+        for waiting in ready:
+            self.submit(waiting)
+
+    def list_task(self, task):
+        # Returns False when the task was parked part way through.
+        while not self.stopped:
+            if self.ordered and self.park(task):
+                return False
+            args = {"Bucket": self.bucket, "Prefix": task.prefix, "Delimiter": "/"}
+            if task.token:
+                args["ContinuationToken"] = task.token
+            elif task.start_after:
+                args["StartAfter"] = task.start_after
+            if self.max_lists:
+                with self.lock:
+                    self.lists += 1
+                    if self.lists > self.max_lists:
+                        raise ListLimit(self.max_lists)
+            resp = self.client.list_objects_v2(**args)
+            names = heapq.merge(
+                ((obj["Key"], obj) for obj in resp.get("Contents", [])),
+                ((cp["Prefix"], None) for cp in resp.get("CommonPrefixes", [])),
+                key=lambda item: item[0],
+            )
+            items = []
+            first = last = None
+            ended = False
+            for name, obj in names:
+                if task.upper is not None and name >= task.upper:
+                    ended = True
+                    break
+                first = first or name
+                last = name
+                if obj is None:
+                    if self.descend is not None and not self.descend(name):
+                        continue
+                    child = _Task(name)
+                    items.append(("task", child))
+                    self.submit(child)
+                else:
+                    items.append(("obj", obj))
+            if items:
+                self.emit(task, ("page", items))
+            if ended or not resp.get("IsTruncated") or last is None:
+                return True
+            task.token = resp.get("NextContinuationToken", "")
+            if task.pages == 0 and self.lister.split and task.depth < MAX_SPLIT_DEPTH:
+                self.split(task, first, last)
+            task.pages += 1
+        return True
+
+    def split(self, task, first, last):
+        bounds = split_points(task.prefix, first, last, task.upper)
+        if not bounds:
+            return
+        uppers = bounds[1:] + [task.upper]
+        segments = [_Task(task.prefix, start_after_for(b), u, task.depth + 1) for b, u in zip(bounds, uppers)]
+        # This task keeps paging up to the first boundary; the segments cover the rest.
+        task.upper = bounds[0]
+        task.tail.extend(segments)
+        for segment in segments:
+            self.submit(segment)
+
+
+class KeyspaceLister:
+    """Walks every object under a prefix with concurrent LIST calls.
+
+    Sub-folders found through a ``/`` delimiter listing are walked in
+    parallel on ``pool``. A folder level whose first page is truncated is
+    split into ``StartAfter`` key ranges that are listed concurrently, and
+    each range splits again if it is large. ``iter_objects`` yields the
+    merged stream, in key order when ``ordered`` is set (results that
+    arrive ahead of the cursor are buffered). At most about
+    ``buffer_pages`` listing pages are held ahead of the consumer; past that,
+    workers wait for it, so a walk of any size runs in bounded memory.
+    """
+
+    def __init__(self, pool, split=True, buffer_pages=8):
+        self.pool = pool
+        self.split = split
+        self.buffer_pages = max(1, buffer_pages)
+
+    def iter_objects(self, client, bucket, prefix, ordered=False, descend=None, max_lists=0):
+        """Yield every object under ``prefix``.
+
+        ``descend(folder)`` returning False leaves that sub-folder out of the
+        walk. After ``max_lists`` LIST calls the walk raises ``ListLimit``.
+        """
+        walk = _Walk(self, client, bucket, ordered, descend, max_lists)
+        root = _Task(prefix)
+        walk.current = root
+        walk.submit(root)
+        try:
+            if ordered:
+                # Each entry is a task and the rest of the page being read from it.
+                stack = [[root, iter(())]]
+                while stack:
+                    entry = stack[-1]
+                    pending = next(entry[1], None)
+                    if pending is not None:
+                        kind, value = pending
+                        if kind == "task":
+                            stack.append([value, iter(())])
+                            walk.resume(value)
+                        else:
+                            yield value
+                        continue
+                    item = entry[0].out.get()
+                    if item is DONE:
+                        stack.pop()
+                        if stack:
+                            walk.resume(stack[-1][0])
+                        continue
+                    walk.resume(entry[0], taken=True)
+                    kind, value = item
+                    if kind == "error":
+                        raise value
+                    entry[1] = iter(value)
+            else:
+                while True:
+                    item = walk.shared.get()
+                    if item is DONE:
+                        return
+                    kind, value = item
+                    if kind == "error":
+                        raise value
+                    for item_kind, obj in value:
+                        if item_kind == "obj":
+                            yield obj
+        finally:
+            walk.stopped = True
@@ -0,0 +1,98 @@
+"""Non-blocking logging for S3 File Manager.
+
+Request threads only format the message and put the record on a bounded
+queue; a listener thread writes it to the rotating log file and stdout. When
+the queue is full the record is dropped and counted instead of blocking the
+request, and the next record that fits is preceded by a warning with the
+number dropped.
+"""
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+# Attributes every LogRecord has; anything else came in through ``extra=``.
+RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_FIELDS and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.reported = 0
+        self.exceptions = logging.Formatter()
+
+    def prepare(self, record):
+        # Tracebacks and arguments are rendered here so the listener never
+        # touches objects the request thread may still change.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.exceptions.formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.dropped != self.reported:
+                missed = self.dropped - self.reported
+                warning = logging.LogRecord("logqueue", logging.WARNING, __file__, 0, "Log queue full dropped=%s", (missed,), None)
+                self.queue.put_nowait(self.prepare(warning))
+                self.reported += missed
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Unlocked increment: a lost update under contention only undercounts.
+            self.dropped += 1
+
+
+def build_file_handler(path, max_bytes, backups, when):
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding="utf-8", utc=True)
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+
+
+def install(path, fmt="json", max_bytes=50 * 1024 * 1024, backups=5, when="", queue_size=10000, level=logging.INFO):
+    """Route the root logger through a queue; returns the handler, whose ``dropped`` counts lost records."""
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    sinks = [build_file_handler(path, max_bytes, backups, when), logging.StreamHandler(sys.stdout)]
+    for sink in sinks:
+        sink.setFormatter(formatter)
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener.start()
+    # Flush what is still queued when the process exits normally.
+    atexit.register(listener.stop)
+    return handler
@@ -0,0 +1,286 @@
+"""Prometheus metrics for S3 File Manager.
+
+Counters, gauges and histograms are sharded per thread: a thread only ever
+writes to its own dict, so recording a sample takes no lock. A scrape adds
+the shards up, folding the shards of finished threads into a base total so
+the per-connection threads of the HTTP server do not pile up.
+
+With a shared ``directory`` every process also writes its totals to
+``<directory>/<host>-<pid>.json`` every ``interval`` seconds, and a scrape
+adds the recent files of the other processes, so scraping any one worker
+reports the whole fleet that shares the volume.
+"""
+
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FOLD_AT = 256
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    def __init__(self, registry, kind, name, help_text, labels=(), buckets=None):
+        self.registry = registry
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+
+    def inc(self, labels=(), value=1):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def add(self, value, labels=()):
+        self.inc(labels, value)
+
+    def observe(self, value, labels=()):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        cells = shard.get(key)
+        if cells is None:
+            # One count per bucket plus +Inf, then the sum of observed values.
+            cells = shard[key] = [0] * (len(self.buckets) + 2)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+
+class Callback:
+    """A metric read at scrape time; ``fn()`` returns ``{label values: value}``."""
+
+    def __init__(self, kind, name, help_text, labels, fn):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = None
+        self.fn = fn
+
+
+def _merge(totals, key, value):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        for i, cell in enumerate(value):
+            current[i] += cell
+    else:
+        totals[key] = current + value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+class Registry:
+    def __init__(self, directory="", interval=15):
+        self.metrics = []
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.shards = []
+        self.base = {}
+        self.directory = directory
+        self.interval = max(1, interval)
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self.writer = None
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Metric(self, "counter", name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Metric(self, "gauge", name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Metric(self, "histogram", name, help_text, labels, buckets))
+
+    def callback(self, kind, name, help_text, labels, fn):
+        self.callbacks.append(Callback(kind, name, help_text, labels, fn))
+
+    def shard(self):
+        shard = getattr(self.local, "values", None)
+        if shard is None:
+            shard = self.local.values = {}
+            with self.lock:
+                self.shards.append((threading.current_thread(), shard))
+                if len(self.shards) > FOLD_AT:
+                    self._fold_locked()
+        return shard
+
+    def _fold_locked(self):
+        alive = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for key, value in shard.items():
+                    _merge(self.base, key, value)
+        self.shards = alive
+
+    def totals(self):
+        """Everything this process recorded, including callback metrics."""
+        with self.lock:
+            self._fold_locked()
+            totals = {}
+            for key, value in self.base.items():
+                _merge(totals, key, value)
+            shards = [shard for _, shard in self.shards]
+        for shard in shards:
+            # dict() copies under the GIL, so the owner thread can keep writing.
+            for key, value in dict(shard).items():
+                _merge(totals, key, list(value) if isinstance(value, list) else value)
+        for metric in self.callbacks:
+            try:
+                values = metric.fn()
+            except Exception:
+                continue
+            for labels, value in values.items():
+                _merge(totals, (metric.name, tuple(labels)), value)
+        return totals
+
+    # ---------- multi-process ----------
+    def start_writer(self):
+        if not self.directory or self.writer is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.writer = threading.Thread(target=self._write_loop, name="s3fm-metrics", daemon=True)
+        self.writer.start()
+
+    def _write_loop(self):
+        while True:
+            try:
+                self.write_snapshot()
+            except Exception:
+                pass
+            time.sleep(self.interval)
+
+    def write_snapshot(self):
+        values = [[name, list(labels), value] for (name, labels), value in self.totals().items()]
+        path = os.path.join(self.directory, self.name + ".json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"at": time.time(), "values": values}, f)
+        os.replace(tmp, path)
+
+    def peer_totals(self, totals):
+        if not self.directory:
+            return
+        cutoff = time.time() - 3 * self.interval
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json") or name == self.name + ".json":
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # Processes that stopped writing are gone; their counters leave with them.
+            if snapshot.get("at", 0) < cutoff:
+                continue
+            for metric_name, labels, value in snapshot.get("values", []):
+                _merge(totals, (metric_name, tuple(labels)), value)
+
+    # ---------- exposition ----------
+    def render(self):
+        totals = self.totals()
+        self.peer_totals(totals)
+        series = {}
+        for (name, labels), value in totals.items():
+            series.setdefault(name, []).append((labels, value))
+        lines = []
+        for metric in self.metrics + self.callbacks:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in sorted(series.get(metric.name, []), key=lambda item: item[0]):
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_labels(metric.labels, labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                    cumulative += count
+                    le = f'le="{_number(float(bound))}"'
+                    lines.append(f"{metric.name}_bucket{_labels(metric.labels, labels, le)} {cumulative}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labels, labels)} {_number(value[-1])}")
+                lines.append(f"{metric.name}_count{_labels(metric.labels, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class CountingReader:
+    """File wrapper that adds the bytes read to ``counter``."""
+
+    def __init__(self, raw, counter, labels=()):
+        self.raw = raw
+        self.counter = counter
+        self.counter_labels = labels
+
+    def _count(self, data):
+        if data:
+            self.counter.inc(self.counter_labels, len(data))
+        return data
+
+    def read(self, *args):
+        return self._count(self.raw.read(*args))
+
+    def read1(self, *args):
+        return self._count(self.raw.read1(*args))
+
+    def readline(self, *args):
+        return self._count(self.raw.readline(*args))
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        if n:
+            self.counter.inc(self.counter_labels, n)
+        return n
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class CountingWriter:
+    """File wrapper that adds the bytes written to ``counter``."""
+
+    def __init__(self, raw, counter, labels=()):
+        self.raw = raw
+        self.counter = counter
+        self.counter_labels = labels
+
+    def write(self, data):
+        result = self.raw.write(data)
+        self.counter.inc(self.counter_labels, len(data))
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
@@ -0,0 +1,155 @@
+"""Versioned schema migrations for the S3 File Manager database.
+
+``schema_migrations`` records each version applied. A database that is
+already current costs one query at boot. Otherwise the migrating node takes
+a transaction-scoped advisory lock, and applies the pending versions and
+their bookkeeping rows in a single transaction. Nodes booting together
+therefore migrate once and never see a half-applied schema. Version 1 is
+written to run on databases created before this table existed.
+"""
+
+# pg_advisory_xact_lock key, "S3FM" in ASCII.
+LOCK_KEY = 0x5333464D
+
+MIGRATIONS = (
+    (1, "auth tables", (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+          id SERIAL PRIMARY KEY,
+          email TEXT UNIQUE NOT NULL,
+          password_hash TEXT NOT NULL,
+          created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+          id SERIAL PRIMARY KEY,
+          token TEXT UNIQUE NOT NULL,
+          user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+          created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+          expires_at TIMESTAMPTZ NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS app_settings (
+          user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+          bucket TEXT,
+          aws_access_key TEXT,
+          aws_secret_key TEXT,
+          aws_region TEXT
+        )
+        """,
+        # Databases from before per-user settings keyed app_settings by "id".
+        """
+        DO $$
+        BEGIN
+          IF EXISTS (
+            SELECT 1
+            FROM information_schema.columns
+            WHERE table_name = 'app_settings' AND column_name = 'id'
+          ) AND NOT EXISTS (
+            SELECT 1
+            FROM information_schema.columns
+            WHERE table_name = 'app_settings' AND column_name = 'user_id'
+          ) THEN
+            ALTER TABLE app_settings RENAME COLUMN id TO user_id;
+          END IF;
+        END $$;
+        """,
+        """
+        DO $$
+        BEGIN
+          IF NOT EXISTS (
+            SELECT 1
+            FROM information_schema.table_constraints
+            WHERE table_name = 'app_settings'
+              AND constraint_name = 'app_settings_user_id_fkey'
+          ) THEN
+            ALTER TABLE app_settings
+            ADD CONSTRAINT app_settings_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+          END IF;
+        EXCEPTION
+          WHEN duplicate_object THEN NULL;
+        END $$;
+        """,
+    )),
+    (2, "operations audit table", (
+        # user_id has no foreign key: the trail outlives deleted accounts.
+        """
+        CREATE TABLE IF NOT EXISTS operations (
+          id BIGSERIAL PRIMARY KEY,
+          at TIMESTAMPTZ NOT NULL,
+          user_id INTEGER,
+          node TEXT,
+          client TEXT,
+          action TEXT NOT NULL,
+          bucket TEXT,
+          key TEXT,
+          target TEXT,
+          size BIGINT,
+          status TEXT NOT NULL,
+          detail TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS operations_user_at ON operations (user_id, at DESC)",
+        "CREATE INDEX IF NOT EXISTS operations_bucket_key ON operations (bucket, key text_pattern_ops)",
+        "CREATE INDEX IF NOT EXISTS operations_at ON operations USING BRIN (at)",
+    )),
+    (3, "session expiry and revocations", (
+        "CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)",
+        "CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions (user_id)",
+        """
+        CREATE TABLE IF NOT EXISTS session_revocations (
+          id BIGSERIAL PRIMARY KEY,
+          user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+          token_id TEXT,
+          revoked_at TIMESTAMPTZ NOT NULL,
+          expires_at TIMESTAMPTZ NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS session_revocations_expires_at ON session_revocations (expires_at)",
+    )),
+)
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(cur):
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the schema up to ``LATEST``; returns the versions applied here."""
+    import psycopg2.errors
+    with conn.cursor() as cur:
+        try:
+            if current_version(cur) >= LATEST:
+                conn.rollback()
+                return []
+        except psycopg2.errors.UndefinedTable:
+            pass
+        conn.rollback()
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version INTEGER PRIMARY KEY,
+              name TEXT NOT NULL,
+              applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        # Another node may have migrated while this one waited for the lock.
+        version = current_version(cur)
+        applied = []
+        for number, name, statements in MIGRATIONS:
+            if number <= version:
+                continue
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (number, name))
+            applied.append(number)
+    conn.commit()
+    return applied
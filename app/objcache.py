@@ -0,0 +1,222 @@
+"""Bounded on-disk LRU cache of S3 objects for S3 File Manager."""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheFill:
+    def __init__(self, cache, bucket, key, meta):
+        self.cache = cache
+        self.bucket = bucket
+        self.key = key
+        self.meta = meta
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.tmp_dir, prefix="fill-")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self.file.close()
+        size = os.path.getsize(self.tmp_path)
+        expected = self.meta.get("size")
+        if expected is not None and size != expected:
+            self.abort()
+            return None
+        return self.cache._commit(self.bucket, self.key, self.meta, self.tmp_path, size)
+
+    def abort(self):
+        try:
+            self.file.close()
+        except Exception:
+            pass
+        try:
+            os.unlink(self.tmp_path)
+        except OSError:
+            pass
+
+
+class ObjectCache:
+    """Objects keyed by bucket/key/ETag, evicted least-recently-used by total bytes.
+
+    Each object is stored as ``<root>/<hh>/<hash>`` with a ``<hash>.json``
+    sidecar holding the bucket, key, ETag, size and response headers, so the
+    index can be rebuilt after a restart.
+    """
+
+    def __init__(self, root, max_bytes, max_object_bytes=None):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes if max_object_bytes is not None else max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def cacheable(self, size):
+        return self.enabled and size is not None and 0 <= size <= self.max_object_bytes
+
+    def _name(self, bucket, key, etag):
+        return hashlib.sha256(f"{bucket}\0{key}\0{etag}".encode("utf-8")).hexdigest()
+
+    def relpath(self, entry):
+        return os.path.relpath(entry["path"], self.root)
+
+    def _load(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            if dirpath == self.tmp_dir:
+                for name in filenames:
+                    try:
+                        os.unlink(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+                continue
+            for name in filenames:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(dirpath, name)
+                data_path = meta_path[:-len(".json")]
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    entry["size"] = os.path.getsize(data_path)
+                    entry["path"] = data_path
+                    entry["validated"] = 0.0
+                    found.append((os.path.getmtime(meta_path), entry))
+                except Exception:
+                    for path in (meta_path, data_path):
+                        try:
+                            os.unlink(path)
+                        except OSError:
+                            pass
+        found.sort(key=lambda item: item[0])
+        with self.lock:
+            for _, entry in found:
+                self.entries[(entry["bucket"], entry["key"])] = entry
+                self.total += entry["size"]
+            victims = self._evict_locked()
+        self._unlink(victims)
+
+    def lookup(self, bucket, key):
+        with self.lock:
+            entry = self.entries.get((bucket, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end((bucket, key))
+            entry = dict(entry)
+        try:
+            os.utime(entry["path"] + ".json")
+        except OSError:
+            return None
+        return entry
+
+    def mark_validated(self, bucket, key):
+        with self.lock:
+            entry = self.entries.get((bucket, key))
+            if entry is not None:
+                entry["validated"] = time.time()
+
+    def invalidate(self, bucket, key):
+        with self.lock:
+            entry = self.entries.pop((bucket, key), None)
+            if entry is not None:
+                self.total -= entry["size"]
+        if entry is not None:
+            self._unlink([entry])
+
+    def invalidate_prefix(self, bucket, prefix):
+        with self.lock:
+            stale = [k for k in self.entries if k[0] == bucket and k[1].startswith(prefix)]
+            entries = [self.entries.pop(k) for k in stale]
+            for entry in entries:
+                self.total -= entry["size"]
+        self._unlink(entries)
+
+    def begin(self, bucket, key, meta):
+        return CacheFill(self, bucket, key, meta)
+
+    def _commit(self, bucket, key, meta, tmp_path, size):
+        name = self._name(bucket, key, meta.get("etag", ""))
+        path = os.path.join(self.root, name[:2], name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "bucket": bucket,
+            "key": key,
+            "etag": meta.get("etag", ""),
+            "content_type": meta.get("content_type", ""),
+            "last_modified": meta.get("last_modified", ""),
+            "size": size,
+        }
+        # A temp name of its own: two fills of the same object may commit at once.
+        fd, meta_tmp = tempfile.mkstemp(dir=self.tmp_dir, prefix="meta-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            entry["path"] = path
+            entry["validated"] = time.time()
+            with self.lock:
+                os.replace(tmp_path, path)
+                os.replace(meta_tmp, path + ".json")
+                previous = self.entries.pop((bucket, key), None)
+                if previous is not None:
+                    self.total -= previous["size"]
+                self.entries[(bucket, key)] = entry
+                self.total += size
+                victims = self._evict_locked()
+        except Exception:
+            for leftover in (tmp_path, meta_tmp):
+                try:
+                    os.unlink(leftover)
+                except OSError:
+                    pass
+            raise
+        if previous is not None and previous["path"] != path:
+            victims.append(previous)
+        self._unlink(victims)
+        return dict(entry)
+
+    def _evict_locked(self):
+        victims = []
+        while self.total > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.total -= entry["size"]
+            victims.append(entry)
+        return victims
+
+    def _unlink(self, entries):
+        # Open readers keep their file descriptor, so unlinking under a sendfile is safe.
+        for entry in entries:
+            for path in (entry["path"], entry["path"] + ".json"):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,146 @@
+"""Password hashing for S3 File Manager.
+
+Each hash records its scheme and work factor: ``pbkdf2_sha256$<iterations>$
+<salt>$<hash>``, ``scrypt$<n>$<r>$<p>$<salt>$<hash>``, or an argon2 PHC string
+(optional, needs argon2-cffi). Hashes from before this format are
+base64(salt + digest) with 100,000 PBKDF2-SHA256 iterations, and are still
+accepted. A hash that is not at the configured scheme and parameters is
+replaced after the next successful sign-in.
+
+The key derivation runs on a small dedicated pool. PBKDF2, scrypt and argon2
+release the GIL while they work, so a burst of sign-ins occupies at most
+``workers`` cores while other requests are served. Past ``max_pending``
+waiting jobs, new ones fail at once with ``Busy``.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+LEGACY_ITERATIONS = 100_000
+SALT_BYTES = 16
+DEFAULTS = {
+    "pbkdf2_sha256": {"iterations": 100_000},
+    "scrypt": {"n": 16384, "r": 8, "p": 1},
+    "argon2": {"time_cost": 3, "memory_kib": 65536, "parallelism": 1},
+}
+
+
+class Busy(Exception):
+    pass
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+def parse_params(text):
+    """``"n=32768,r=8"`` -> ``{"n": 32768, "r": 8}``; anything that is not ``name=int`` is ignored."""
+    params = {}
+    for item in (text or "").split(","):
+        name, _, value = item.partition("=")
+        if value.strip().isdigit():
+            params[name.strip()] = int(value)
+    return params
+
+
+def encode(password, scheme, params):
+    salt = secrets.token_bytes(SALT_BYTES)
+    if scheme == "pbkdf2_sha256":
+        iterations = params["iterations"]
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+    if scheme == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+    if scheme == "argon2":
+        return _argon2_hasher(params).hash(password)
+    raise ValueError(f"unknown password scheme: {scheme}")
+
+
+def check(password, stored):
+    try:
+        if stored.startswith("$argon2"):
+            if argon2 is None:
+                logging.error("argon2 password hash found but argon2-cffi is not installed")
+                return False
+            try:
+                return argon2.PasswordHasher().verify(stored, password)
+            except argon2.exceptions.VerificationError:
+                return False
+        if stored.startswith("pbkdf2_sha256$"):
+            _, iterations, salt, digest = stored.split("$")
+            derived = hashlib.pbkdf2_hmac("sha256", password.encode(), _unb64(salt), int(iterations))
+            return hmac.compare_digest(derived, _unb64(digest))
+        if stored.startswith("scrypt$"):
+            _, n, r, p, salt, digest = stored.split("$")
+            return hmac.compare_digest(_scrypt(password, _unb64(salt), int(n), int(r), int(p)), _unb64(digest))
+        data = base64.b64decode(stored.encode())
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode(), data[:SALT_BYTES], LEGACY_ITERATIONS)
+        return hmac.compare_digest(derived, data[SALT_BYTES:])
+    except Exception:
+        return False
+
+
+def needs_rehash(stored, scheme, params):
+    if scheme == "argon2":
+        return not stored.startswith("$argon2") or _argon2_hasher(params).check_needs_rehash(stored)
+    if scheme == "pbkdf2_sha256":
+        return not stored.startswith(f"pbkdf2_sha256${params['iterations']}$")
+    return not stored.startswith(f"scrypt${params['n']}${params['r']}${params['p']}$")
+
+
+def _argon2_hasher(params):
+    return argon2.PasswordHasher(
+        time_cost=params["time_cost"], memory_cost=params["memory_kib"], parallelism=params["parallelism"],
+    )
+
+
+class Hasher:
+    def __init__(self, scheme="pbkdf2_sha256", params=None, workers=2, max_pending=32):
+        if scheme not in DEFAULTS or (scheme == "argon2" and argon2 is None):
+            logging.warning("Password scheme %s is not available, using pbkdf2_sha256", scheme)
+            scheme = "pbkdf2_sha256"
+        self.scheme = scheme
+        self.params = dict(DEFAULTS[scheme], **{k: v for k, v in (params or {}).items() if k in DEFAULTS[scheme]})
+        self.slots = threading.BoundedSemaphore(max(1, workers) + max(0, max_pending))
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="s3fm-passwords")
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise Busy()
+        try:
+            return self.pool.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self._run(encode, password, self.scheme, self.params)
+
+    def _verify(self, password, stored):
+        if not check(password, stored):
+            return False, None
+        if needs_rehash(stored, self.scheme, self.params):
+            return True, encode(password, self.scheme, self.params)
+        return True, None
+
+    def verify(self, password, stored):
+        """Return ``(ok, new_hash)``; ``new_hash`` is set when ``stored`` should be replaced."""
+        return self._run(self._verify, password, stored)
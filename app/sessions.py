@@ -0,0 +1,145 @@
+"""Signed session tokens for S3 File Manager.
+
+A token carries the user id, email, issue time and expiry, and is signed
+with HMAC-SHA256, so checking it needs no database round trip. Logout and
+password changes write a row to ``session_revocations``. Each node keeps
+the live revocations in memory and polls the table for rows added by other
+nodes. A revocation either names one token id, or covers every token a user
+was issued before a point in time.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+
+PREFIX = "v1."
+
+
+def derive_key(secret, label=b"s3fm-session-v1"):
+    # A separate key per purpose: the raw secret also keys the credential cipher.
+    return hmac.new(secret, label, hashlib.sha256).digest()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def is_signed(token):
+    return bool(token) and token.startswith(PREFIX)
+
+
+class Signer:
+    def __init__(self, key):
+        self.key = key
+
+    def _sign(self, payload):
+        return _b64(hmac.new(self.key, payload.encode("utf-8", "replace"), hashlib.sha256).digest())
+
+    def issue(self, user_id, email, expires):
+        """Return ``(token, token_id)``; ``expires`` is a unix timestamp in seconds."""
+        token_id = secrets.token_urlsafe(12)
+        payload = f"{PREFIX}{int(user_id)}.{time.time_ns() // 1_000_000}.{int(expires)}.{token_id}.{_b64(email.encode('utf-8'))}"
+        return f"{payload}.{self._sign(payload)}", token_id
+
+    def verify(self, token, now=None):
+        """Return the claims of a valid, unexpired token, else None."""
+        if not is_signed(token):
+            return None
+        payload, _, signature = token.rpartition(".")
+        if not hmac.compare_digest(signature.encode("utf-8", "replace"), self._sign(payload).encode("ascii")):
+            return None
+        try:
+            user_id, issued_ms, expires, token_id, email = payload[len(PREFIX):].split(".")
+            claims = {
+                "id": int(user_id),
+                "email": _unb64(email).decode("utf-8"),
+                "issued_ms": int(issued_ms),
+                "expires": int(expires),
+                "token_id": token_id,
+            }
+        except ValueError:
+            return None
+        if claims["expires"] <= (now if now is not None else time.time()):
+            return None
+        return claims
+
+
+class Revocations:
+    """In-memory copy of ``session_revocations``.
+
+    ``load(after_id)`` returns rows ``(id, user_id, token_id, revoked_ms,
+    expires)`` added since ``after_id``; without it only local revocations
+    are known and the thread just sweeps. A NULL ``token_id`` revokes all of
+    the user's tokens issued before ``revoked_ms``. ``expires`` is when the
+    last token it can match runs out.
+    """
+
+    def __init__(self, load, refresh_seconds=10):
+        self.load = load
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.users = {}
+        self.last_id = 0
+        self.thread = None
+
+    def add(self, user_id, token_id, revoked_ms, expires):
+        with self.lock:
+            if token_id:
+                self.tokens[token_id] = expires
+            else:
+                before, until = self.users.get(user_id, (0, 0))
+                self.users[user_id] = (max(before, revoked_ms), max(until, expires))
+
+    def revoked(self, claims):
+        if claims["token_id"] in self.tokens:
+            return True
+        before = self.users.get(claims["id"])
+        return before is not None and claims["issued_ms"] < before[0]
+
+    def refresh(self):
+        rows = self.load(self.last_id)
+        for row_id, user_id, token_id, revoked_ms, expires in rows:
+            self.add(user_id, token_id, revoked_ms, expires)
+            self.last_id = max(self.last_id, row_id)
+        now = time.time()
+        with self.lock:
+            self.tokens = {k: v for k, v in self.tokens.items() if v > now}
+            self.users = {k: v for k, v in self.users.items() if v[1] > now}
+        return len(rows)
+
+    def start(self, sweep=None, sweep_seconds=3600):
+        """Poll for revocations from other nodes, and call ``sweep()`` every ``sweep_seconds``."""
+        if self.thread is not None:
+            return
+        if self.load:
+            # Load what is already revoked before the first request is served.
+            self.refresh()
+        self.thread = threading.Thread(target=self._run, args=(sweep, sweep_seconds), name="s3fm-sessions", daemon=True)
+        self.thread.start()
+
+    def _run(self, sweep, sweep_seconds):
+        next_sweep = time.monotonic() + 60
+        while True:
+            time.sleep(self.refresh_seconds)
+            if self.load:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.warning("Session revocation refresh failed: %s", e)
+            if sweep and time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + sweep_seconds
+                try:
+                    removed = sweep()
+                    if removed:
+                        logging.info("Session sweep removed=%s", removed)
+                except Exception as e:
+                    logging.warning("Session sweep failed: %s", e)
@@ -153,6 +153,55 @@ function applyView() {
         });
       });
     }
+    var UPLOAD_PARALLEL = 4;
+    var UPLOAD_BATCH_FILES = 16;
+    var UPLOAD_BATCH_BYTES = 16 * 1024 * 1024;
+    var droppedFiles = null;
+    function readDirectory(entry, path, out) {
+      return new Promise(function(resolve) {
+        var reader = entry.createReader();
+        var children = [];
+        function next() {
+          reader.readEntries(function(batch) {
+            if (!batch.length) {
+              Promise.all(children.map(function(child) {
+                return walkEntry(child, path + entry.name + '/', out);
+              })).then(resolve);
+              return;
+            }
+            children = children.concat(Array.prototype.slice.call(batch));
+            next();
+          }, function() { resolve(); });
+        }
+        next();
+      });
+    }
+    function walkEntry(entry, path, out) {
+      if (entry.isFile) {
+        return new Promise(function(resolve) {
+          entry.file(function(file) {
+            out.push({ file: file, path: path + file.name });
+            resolve();
+          }, function() { resolve(); });
+        });
+      }
+      if (entry.isDirectory) {
+        return readDirectory(entry, path, out);
+      }
+      return Promise.resolve();
+    }
+    function collectDropped(dataTransfer) {
+      var items = dataTransfer.items ? Array.prototype.slice.call(dataTransfer.items) : [];
+      var entries = items.map(function(item) {
+        return item.webkitGetAsEntry ? item.webkitGetAsEntry() : null;
+      }).filter(function(entry) { return !!entry; });
+      var hasDirectory = entries.some(function(entry) { return entry.isDirectory; });
+      if (!hasDirectory) return Promise.resolve(null);
+      var out = [];
+      return Promise.all(entries.map(function(entry) { return walkEntry(entry, '', out); })).then(function() {
+        return out;
+      });
+    }
     function initDropzone() {
       var zone = document.getElementById('dropzone');
       var fileInput = document.getElementById('fileInput');
@@ -171,14 +220,97 @@ function applyView() {
         });
       });
       zone.addEventListener('drop', function(e) {
-        if (e.dataTransfer && e.dataTransfer.files && e.dataTransfer.files.length) {
-          fileInput.files = e.dataTransfer.files;
-          if (fileLabel) {
-            fileLabel.textContent = e.dataTransfer.files.length + ' files selected';
+        if (!e.dataTransfer) return;
+        var files = e.dataTransfer.files;
+        collectDropped(e.dataTransfer).then(function(entries) {
+          droppedFiles = entries;
+          if (!entries && files && files.length) {
+            fileInput.files = files;
+          }
+          var count = entries ? entries.length : (files ? files.length : 0);
+          if (fileLabel && count) {
+            fileLabel.textContent = count + ' files selected';
           }
+        });
+      });
+    }
+    function buildBatches(entries) {
+      var batches = [];
+      var current = [];
+      var bytes = 0;
+      entries.forEach(function(entry) {
+        if (current.length && (current.length >= UPLOAD_BATCH_FILES || bytes + entry.file.size > UPLOAD_BATCH_BYTES)) {
+          batches.push(current);
+          current = [];
+          bytes = 0;
+        }
+        current.push(entry);
+        bytes += entry.file.size;
+      });
+      if (current.length) batches.push(current);
+      return batches;
+    }
+    function sendBatch(url, prefix, batch, onProgress) {
+      return new Promise(function(resolve) {
+        var xhr = new XMLHttpRequest();
+        xhr.open('POST', url, true);
+        xhr.upload.onprogress = function(ev) {
+          if (ev.lengthComputable) onProgress(ev.loaded / ev.total);
+        };
+        function failAll(message) {
+          resolve({ retry: true, files: batch.map(function(entry) {
+            return { name: entry.path, status: 'error', error: message };
+          }) });
         }
+        xhr.onload = function() {
+          var manifest = null;
+          try { manifest = JSON.parse(xhr.responseText); } catch (err) { manifest = null; }
+          if (xhr.status === 200 && manifest && manifest.files) {
+            onProgress(1);
+            resolve(manifest);
+            return;
+          }
+          failAll((manifest && manifest.error) || ('Error ' + xhr.status));
+        };
+        xhr.onerror = function() { failAll('Network error'); };
+        var fd = new FormData();
+        fd.append('prefix', prefix);
+        batch.forEach(function(entry) { fd.append('file', entry.file, entry.path); });
+        xhr.send(fd);
       });
     }
+    function runUploads(url, prefix, entries, onProgress) {
+      var batches = buildBatches(entries);
+      var totalBytes = entries.reduce(function(sum, entry) { return sum + entry.file.size; }, 0) || 1;
+      var loaded = batches.map(function() { return 0; });
+      var results = [];
+      var nextIndex = 0;
+      function report() {
+        var sent = 0;
+        batches.forEach(function(batch, i) {
+          var size = batch.reduce(function(sum, entry) { return sum + entry.file.size; }, 0);
+          sent += size * loaded[i];
+        });
+        onProgress(sent / totalBytes);
+      }
+      function worker() {
+        if (nextIndex >= batches.length) return Promise.resolve();
+        var index = nextIndex++;
+        var progress = function(fraction) { loaded[index] = fraction; report(); };
+        return sendBatch(url, prefix, batches[index], progress).then(function(manifest) {
+          if (!manifest.retry) return manifest;
+          return sendBatch(url, prefix, batches[index], progress);
+        }).then(function(manifest) {
+          results = results.concat(manifest.files);
+          return worker();
+        });
+      }
+      var workers = [];
+      for (var i = 0; i < Math.min(UPLOAD_PARALLEL, batches.length); i++) {
+        workers.push(worker());
+      }
+      return Promise.all(workers).then(function() { return results; });
+    }
     function initUpload() {
       var form = document.getElementById('uploadForm');
       if (!form) return;
@@ -189,7 +321,13 @@ function applyView() {
       form.addEventListener('submit', function(e) {
         e.preventDefault();
         var fileInput = document.getElementById('fileInput');
-        if (!fileInput || !fileInput.files.length) {
+        var entries = droppedFiles;
+        if (!entries && fileInput && fileInput.files.length) {
+          entries = Array.prototype.slice.call(fileInput.files).map(function(file) {
+            return { file: file, path: file.webkitRelativePath || file.name };
+          });
+        }
+        if (!entries || !entries.length) {
           showAlert('Upload', 'Choose a file first');
           return;
         }
@@ -197,32 +335,31 @@ function applyView() {
         bar.style.width = '0%';
         txt.textContent = '0%';
 
-        var xhr = new XMLHttpRequest();
-        xhr.open('POST', form.getAttribute('action') || '/', true);
-
-        xhr.upload.onprogress = function(ev) {
-          if (ev.lengthComputable) {
-            var p = Math.round((ev.loaded / ev.total) * 100);
-            bar.style.width = p + '%';
-            txt.textContent = p + '%';
-          }
-        };
-        xhr.onload = function() {
-          if (xhr.status === 200) {
+        var prefixInput = form.querySelector('input[name="prefix"]');
+        var prefix = prefixInput ? prefixInput.value : '';
+        var url = form.getAttribute('data-batch-url') || '/upload';
+        runUploads(url, prefix, entries, function(fraction) {
+          var p = Math.min(100, Math.round(fraction * 100));
+          bar.style.width = p + '%';
+          txt.textContent = p + '%';
+        }).then(function(results) {
+          var failed = results.filter(function(r) { return r.status !== 'ok'; });
+          droppedFiles = null;
+          if (!failed.length) {
             txt.textContent = 'Done';
             setTimeout(function(){ window.location.reload(); }, 500);
-          } else {
-            txt.textContent = (xhr.responseText && xhr.responseText.trim()) ? xhr.responseText : ('Error ' + xhr.status);
+            return;
           }
-        };
-        xhr.onerror = function() { txt.textContent = 'Upload failed'; };
-
-        var fd = new FormData(form);
-        xhr.send(fd);
+          txt.textContent = 'Uploaded ' + (results.length - failed.length) + ' of ' + results.length + ', ' + failed.length + ' failed';
+          var names = failed.slice(0, 5).map(function(r) { return r.name + ': ' + (r.error || 'failed'); });
+          if (failed.length > 5) names.push('and ' + (failed.length - 5) + ' more');
+          showAlert('Upload', names.join('; '));
+        });
       });
       var fileInput = document.getElementById('fileInput');
       if (fileInput && fileLabel) {
         fileInput.addEventListener('change', function() {
+          droppedFiles = null;
           var count = fileInput.files ? fileInput.files.length : 0;
           fileLabel.textContent = count ? (count + ' files selected') : 'No files selected';
         });
@@ -311,7 +448,35 @@ function applyView() {
       if (targetHidden) { targetHidden.value = target && target.value ? target.value : ''; }
       form.submit();
     }
+    function downloadZip(keys) {
+      var bulkForm = document.getElementById('bulkForm');
+      var prefixInput = bulkForm ? bulkForm.querySelector('input[name="prefix"]') : null;
+      var form = document.createElement('form');
+      form.method = 'post';
+      form.action = '/download-zip';
+      form.className = 'is-hidden';
+      var fields = [['prefix', prefixInput ? prefixInput.value : '']].concat(keys.map(function(k) { return ['keys', k]; }));
+      fields.forEach(function(pair) {
+        var input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = pair[0];
+        input.value = pair[1];
+        form.appendChild(input);
+      });
+      document.body.appendChild(form);
+      form.submit();
+      setTimeout(function() { form.remove(); }, 1000);
+    }
     function initBulkActions() {
+      var zipBtn = document.getElementById('bulkZip');
+      if (zipBtn) {
+        zipBtn.addEventListener('click', function(e) {
+          e.preventDefault();
+          var keys = getSelectedKeys();
+          if (!keys.length) { showAlert('Download ZIP', 'Select files or folders first'); return; }
+          downloadZip(keys);
+        });
+      }
       var deleteBtn = document.getElementById('bulkDelete');
       var moveBtn = document.getElementById('bulkMove');
       var copyBtn = document.getElementById('bulkCopy');
@@ -357,6 +522,185 @@ function applyView() {
         });
       });
     }
+    function formatSize(size) {
+      var units = ['B', 'KB', 'MB', 'GB', 'TB'];
+      var value = size;
+      for (var i = 0; i < units.length; i++) {
+        if (value < 1024 || i === units.length - 1) {
+          return i === 0 ? Math.floor(value) + ' B' : value.toFixed(1) + ' ' + units[i];
+        }
+        value /= 1024;
+      }
+    }
+    function initThumbs() {
+      // Full-size fallback for the preview page when no thumbnail can be made.
+      document.querySelectorAll('img[data-thumb-fallback]').forEach(function(img) {
+        img.addEventListener('error', function onError() {
+          img.removeEventListener('error', onError);
+          img.src = img.getAttribute('data-thumb-fallback');
+        });
+      });
+      var images = Array.prototype.slice.call(document.querySelectorAll('img[data-thumb]'));
+      if (!images.length) return;
+      function load(img) {
+        img.addEventListener('error', function() {
+          var box = img.closest('.grid-thumb');
+          if (box) box.parentNode.removeChild(box);
+        });
+        img.src = img.getAttribute('data-thumb');
+        img.removeAttribute('data-thumb');
+      }
+      if (!('IntersectionObserver' in window)) {
+        images.forEach(load);
+        return;
+      }
+      // Cards in the hidden list view never intersect, so nothing loads until the grid is shown.
+      var observer = new IntersectionObserver(function(entries) {
+        entries.forEach(function(entry) {
+          if (!entry.isIntersecting) return;
+          observer.unobserve(entry.target);
+          load(entry.target);
+        });
+      }, { rootMargin: '300px 0px' });
+      images.forEach(function(img) { observer.observe(img); });
+    }
+    function initFollow() {
+      var pre = document.getElementById('textPreview');
+      if (!pre || !pre.getAttribute('data-follow-url')) return;
+      var url = pre.getAttribute('data-follow-url');
+      var offset = parseInt(pre.getAttribute('data-follow-offset'), 10) || 0;
+      var interval = parseInt(pre.getAttribute('data-follow-interval'), 10) || 2000;
+      var label = document.getElementById('textRange');
+      var maxChars = 2 * 1024 * 1024;
+      function poll() {
+        fetch(url + '&from=' + offset, { credentials: 'same-origin' })
+          .then(function(resp) { return resp.ok ? resp.json() : null; })
+          .then(function(data) {
+            if (!data) return;
+            if (data.reset) {
+              window.location.reload();
+              return;
+            }
+            if (data.text) {
+              var atBottom = window.innerHeight + window.scrollY >= document.body.scrollHeight - 40;
+              var text = pre.textContent + data.text;
+              // Keep the page light when following a busy log for a long time.
+              pre.textContent = text.length > maxChars ? text.slice(text.length - maxChars) : text;
+              if (atBottom) window.scrollTo(0, document.body.scrollHeight);
+            }
+            offset = data.next;
+            if (label) label.textContent = 'Following, ' + offset.toLocaleString() + ' of ' + data.size.toLocaleString() + ' bytes';
+          })
+          .catch(function() {})
+          .then(function() { setTimeout(poll, interval); });
+      }
+      setTimeout(poll, interval);
+    }
+    function initGrep() {
+      var form = document.getElementById('grepForm');
+      var results = document.getElementById('grepResults');
+      if (!form || !results) return;
+      var previewBase = form.getAttribute('data-preview-base');
+      var controller = null;
+      function addRow(cls, text, offset) {
+        var row = document.createElement('div');
+        row.className = cls;
+        if (offset !== undefined) {
+          var pos = document.createElement(previewBase ? 'a' : 'span');
+          pos.className = 'mono grep-offset';
+          pos.textContent = '@' + offset;
+          if (previewBase) pos.href = previewBase + '&offset=' + offset;
+          row.appendChild(pos);
+        }
+        var body = document.createElement('span');
+        body.className = offset !== undefined ? 'mono' : '';
+        body.textContent = text;
+        row.appendChild(body);
+        results.appendChild(row);
+      }
+      function handle(line) {
+        if (!line) return;
+        var item = JSON.parse(line);
+        if (item.done) {
+          var note = item.matches + ' matching lines, ' + formatSize(item.scanned) + ' scanned';
+          if (item.limited) note += ' (stopped at the result limit)';
+          if (item.error) note += ' - ' + item.error;
+          addRow('grep-summary', note);
+        } else if (item.error) {
+          addRow('grep-summary', item.error);
+        } else {
+          addRow('grep-hit', item.line + (item.cut ? ' ...' : ''), item.offset);
+        }
+      }
+      form.addEventListener('submit', function(e) {
+        e.preventDefault();
+        if (controller) controller.abort();
+        controller = window.AbortController ? new AbortController() : null;
+        results.innerHTML = '';
+        var params = new URLSearchParams(new FormData(form)).toString();
+        var url = form.getAttribute('data-grep-url') + '&' + params;
+        fetch(url, { credentials: 'same-origin', signal: controller ? controller.signal : undefined })
+          .then(function(resp) {
+            // Matches are streamed as NDJSON; show them as they arrive when the browser allows it.
+            if (!resp.body || !window.TextDecoder) {
+              return resp.text().then(function(text) { text.split('\n').forEach(handle); });
+            }
+            var reader = resp.body.getReader();
+            var decoder = new TextDecoder();
+            var buffer = '';
+            function pump() {
+              return reader.read().then(function(chunk) {
+                if (chunk.done) {
+                  handle(buffer);
+                  return;
+                }
+                buffer += decoder.decode(chunk.value, { stream: true });
+                var lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(handle);
+                return pump();
+              });
+            }
+            return pump();
+          })
+          .catch(function(err) {
+            if (!err || err.name !== 'AbortError') addRow('grep-summary', 'Search failed');
+          });
+      });
+    }
+    function initUsage() {
+      var nodes = Array.prototype.slice.call(document.querySelectorAll('[data-usage]'));
+      if (!nodes.length) return;
+      var prefixes = [];
+      nodes.forEach(function(node) {
+        var p = node.getAttribute('data-usage');
+        if (prefixes.indexOf(p) === -1) prefixes.push(p);
+      });
+      function apply(result) {
+        nodes.forEach(function(node) {
+          var usage = result[node.getAttribute('data-usage')];
+          if (!usage) return;
+          node.textContent = formatSize(usage.bytes) + (usage.complete ? '' : '+');
+          node.title = usage.objects + ' objects';
+          var row = node.closest('[data-kind]');
+          if (row) row.setAttribute('data-size', usage.bytes);
+          var metaId = node.getAttribute('data-usage-meta');
+          var meta = metaId ? document.getElementById(metaId) : null;
+          if (meta) meta.textContent = usage.objects + ' objects including subfolders';
+        });
+      }
+      // The current prefix goes first: walking it warms the server cache for every folder row.
+      var batches = [];
+      for (var i = 0; i < prefixes.length; i += 50) batches.push(prefixes.slice(i, i + 50));
+      batches.reduce(function(chain, batch) {
+        return chain.then(function() {
+          var query = batch.map(function(p) { return 'p=' + encodeURIComponent(p); }).join('&');
+          return fetch('/prefix-usage?' + query, { credentials: 'same-origin' })
+            .then(function(resp) { return resp.ok ? resp.json() : {}; })
+            .then(apply);
+        });
+      }, Promise.resolve()).catch(function() {});
+    }
     document.addEventListener('DOMContentLoaded', function() {
       applyView();      var tableBtn = document.getElementById('viewTable');
       var gridBtn = document.getElementById('viewGrid');
@@ -376,4 +720,8 @@ function applyView() {
       initBulkActions();
       initRename();
       initDeleteLinks();
+      initUsage();
+      initThumbs();
+      initFollow();
+      initGrep();
     });
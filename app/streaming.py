@@ -0,0 +1,99 @@
+"""Body-to-socket copy loop for S3 File Manager downloads."""
+
+import queue
+import threading
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+
+
+class ChunkSizer:
+    # Start small so the first bytes reach the client quickly, then double
+    # while the source keeps filling whole chunks.
+    def __init__(self, min_chunk=MIN_CHUNK, max_chunk=MAX_CHUNK):
+        self.size = min(min_chunk, max_chunk)
+        self.max = max_chunk
+
+    def update(self, n):
+        if n >= self.size and self.size < self.max:
+            self.size = min(self.max, self.size * 2)
+
+
+def read_chunk(src, buf, size):
+    readinto = getattr(src, "readinto", None)
+    if readinto is not None:
+        view = memoryview(buf)[:size]
+        n = readinto(view) or 0
+        return view[:n]
+    return memoryview(src.read(size))
+
+
+def _copy_direct(src, dst, sizer, on_chunk):
+    buf = bytearray(sizer.max)
+    total = 0
+    while True:
+        chunk = read_chunk(src, buf, sizer.size)
+        n = len(chunk)
+        if not n:
+            return total
+        dst.write(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+        total += n
+        sizer.update(n)
+
+
+def _copy_readahead(src, dst, sizer, on_chunk, depth):
+    free = queue.Queue()
+    for _ in range(depth + 1):
+        free.put(bytearray(sizer.max))
+    filled = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            while not stop.is_set():
+                try:
+                    buf = free.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                chunk = read_chunk(src, buf, sizer.size)
+                filled.put((buf, chunk))
+                if not len(chunk):
+                    return
+                sizer.update(len(chunk))
+        except BaseException as e:
+            filled.put((None, e))
+
+    thread = threading.Thread(target=produce, name="s3fm-readahead", daemon=True)
+    thread.start()
+    total = 0
+    try:
+        while True:
+            buf, chunk = filled.get()
+            if buf is None:
+                raise chunk
+            n = len(chunk)
+            if not n:
+                return total
+            dst.write(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+            total += n
+            free.put(buf)
+    finally:
+        stop.set()
+
+
+def copy_stream(src, dst, readahead=0, min_chunk=MIN_CHUNK, max_chunk=MAX_CHUNK, on_chunk=None):
+    """Copy ``src`` to ``dst`` and return the number of bytes written.
+
+    Reads go into one reused buffer (``readinto`` when the source has it) with
+    a chunk size that grows from ``min_chunk`` to ``max_chunk``. With
+    ``readahead`` > 0 a background thread keeps up to that many chunks read
+    ahead, so the S3 fetch and the client write overlap.
+    """
+    sizer = ChunkSizer(min_chunk, max_chunk)
+    if readahead > 0:
+        return _copy_readahead(src, dst, sizer, on_chunk, readahead)
+    return _copy_direct(src, dst, sizer, on_chunk)
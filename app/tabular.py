@@ -0,0 +1,425 @@
+"""Tabular previews of CSV and Parquet objects for S3 File Manager.
+
+Everything reads through ``read(start, end)`` (an inclusive ranged GET) and
+stops at ``max_bytes``. Parquet schemas and statistics come from the footer,
+which is parsed here; rows need pyarrow, which then only fetches the column
+chunks of the selected columns and row group.
+"""
+
+import csv
+import datetime
+import importlib.util
+import io
+import struct
+
+# pyarrow takes longer to import than the rest of the app; it is loaded on the first Parquet row read.
+PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+CSV_EXTENSIONS = (".csv", ".tsv")
+PARQUET_EXTENSIONS = (".parquet", ".parq")
+FOOTER_PROBE = 64 * 1024
+SNIFF_BYTES = 64 * 1024
+PHYSICAL_TYPES = ["BOOLEAN", "INT32", "INT64", "INT96", "FLOAT", "DOUBLE", "BYTE_ARRAY", "FIXED_LEN_BYTE_ARRAY"]
+CODECS = ["UNCOMPRESSED", "SNAPPY", "GZIP", "LZO", "BROTLI", "LZ4", "ZSTD", "LZ4_RAW"]
+CONVERTED_TYPES = {
+    0: "UTF8", 1: "MAP", 3: "LIST", 4: "ENUM", 5: "DECIMAL", 6: "DATE", 7: "TIME_MILLIS", 8: "TIME_MICROS",
+    9: "TIMESTAMP_MILLIS", 10: "TIMESTAMP_MICROS", 19: "JSON", 20: "BSON",
+}
+LOGICAL_TYPES = {
+    1: "STRING", 2: "MAP", 3: "LIST", 4: "ENUM", 5: "DECIMAL", 6: "DATE", 7: "TIME", 8: "TIMESTAMP",
+    10: "INTEGER", 11: "NULL", 12: "JSON", 13: "BSON", 14: "UUID", 15: "FLOAT16",
+}
+STAT_FORMATS = {"INT32": "<i", "INT64": "<q", "FLOAT": "<f", "DOUBLE": "<d"}
+
+
+class TabularError(Exception):
+    pass
+
+
+def table_kind(key):
+    lower = key.lower()
+    if lower.endswith(CSV_EXTENSIONS):
+        return "csv"
+    if lower.endswith(PARQUET_EXTENSIONS):
+        return "parquet"
+    return None
+
+
+def rows_available(kind):
+    return kind == "csv" or PYARROW
+
+
+class RangedFile(io.RawIOBase):
+    """Seekable read-only file over ranged reads, keeping one block in memory."""
+
+    def __init__(self, read, size, max_bytes, block_size=1024 * 1024):
+        super().__init__()
+        self.read_range = read
+        self.size = size
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.pos = 0
+        self.block = b""
+        self.block_start = 0
+        self.fetched = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.pos = max(0, offset)
+        return self.pos
+
+    def fetch(self, start, end):
+        self.fetched += end - start + 1
+        if self.fetched > self.max_bytes:
+            raise TabularError(f"Preview would read more than {self.max_bytes // (1024 * 1024)} MB; select fewer columns")
+        return self.read_range(start, end)
+
+    def readinto(self, buffer):
+        want = min(len(buffer), self.size - self.pos)
+        if want <= 0:
+            return 0
+        offset = self.pos - self.block_start
+        if not (0 <= offset and offset + want <= len(self.block)):
+            length = max(self.block_size, want)
+            self.block = self.fetch(self.pos, min(self.size, self.pos + length) - 1)
+            self.block_start = self.pos
+            offset = 0
+        buffer[:want] = self.block[offset:offset + want]
+        self.pos += want
+        return want
+
+
+class _Compact:
+    # Thrift compact protocol reader, enough for Parquet's FileMetaData.
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def byte(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def varint(self):
+        shift = 0
+        value = 0
+        while True:
+            b = self.byte()
+            value |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return value
+            shift += 7
+
+    def zigzag(self):
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def value(self, kind):
+        if kind in (1, 2):
+            return kind == 1
+        if kind == 3:
+            return struct.unpack("<b", bytes([self.byte()]))[0]
+        if kind in (4, 5, 6):
+            return self.zigzag()
+        if kind == 7:
+            self.pos += 8
+            return struct.unpack_from("<d", self.data, self.pos - 8)[0]
+        if kind == 8:
+            length = self.varint()
+            self.pos += length
+            return bytes(self.data[self.pos - length:self.pos])
+        if kind in (9, 10):
+            return self.list()
+        if kind == 11:
+            size = self.varint()
+            if not size:
+                return {}
+            types = self.byte()
+            return {self.value(types >> 4): self.value(types & 0x0F) for _ in range(size)}
+        if kind == 12:
+            return self.struct()
+        raise TabularError(f"Bad Parquet footer (type {kind})")
+
+    def list(self):
+        header = self.byte()
+        size = header >> 4
+        kind = header & 0x0F
+        if size == 15:
+            size = self.varint()
+        if kind in (1, 2):
+            return [self.byte() == 1 for _ in range(size)]
+        return [self.value(kind) for _ in range(size)]
+
+    def struct(self):
+        fields = {}
+        last = 0
+        while True:
+            header = self.byte()
+            if header == 0:
+                return fields
+            delta = header >> 4
+            field = last + delta if delta else self.zigzag()
+            fields[field] = self.value(header & 0x0F)
+            last = field
+
+
+def _text(value):
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
+
+
+def _stat(value, physical, is_text):
+    if value is None:
+        return None
+    if physical in STAT_FORMATS and len(value) == struct.calcsize(STAT_FORMATS[physical]):
+        return struct.unpack(STAT_FORMATS[physical], value)[0]
+    if physical == "BOOLEAN" and len(value) == 1:
+        return bool(value[0])
+    if is_text:
+        return value.decode("utf-8", errors="replace")[:80]
+    return value[:16].hex()
+
+
+def read_parquet_footer(read, size, max_footer):
+    """Return ``{"rows", "row_groups", "columns", "created_by"}`` from the file footer."""
+    if size < 12:
+        raise TabularError("Not a Parquet file")
+    tail_start = max(0, size - FOOTER_PROBE)
+    tail = read(tail_start, size - 1)
+    if tail[-4:] != b"PAR1":
+        raise TabularError("Not a Parquet file")
+    length = struct.unpack("<I", tail[-8:-4])[0]
+    if length > max_footer:
+        raise TabularError("Parquet footer is too large")
+    start = size - 8 - length
+    if start >= tail_start:
+        footer = tail[start - tail_start:-8]
+    else:
+        footer = read(start, tail_start - 1) + tail[:-8]
+    meta = _Compact(footer).struct()
+
+    columns = []
+    schema = meta.get(2, [])
+
+    def walk(index, path):
+        element = schema[index]
+        children = element.get(5, 0)
+        name = _text(element.get(4, b""))
+        next_index = index + 1
+        if children:
+            for _ in range(children):
+                next_index = walk(next_index, path + [name] if index else path)
+            return next_index
+        logical = element.get(10) or {}
+        annotation = LOGICAL_TYPES.get(next(iter(logical), None)) or CONVERTED_TYPES.get(element.get(6))
+        columns.append({
+            "name": ".".join(path + [name]),
+            "type": PHYSICAL_TYPES[element.get(1, 6)] if element.get(1, 6) < len(PHYSICAL_TYPES) else "UNKNOWN",
+            "logical": annotation or "",
+            "nullable": element.get(3, 0) != 0,
+            "compressed": 0,
+            "uncompressed": 0,
+            "nulls": 0,
+            "min": None,
+            "max": None,
+            "codec": "",
+        })
+        return next_index
+
+    if schema:
+        walk(0, [])
+    by_name = {c["name"]: c for c in columns}
+    row_groups = []
+    for group in meta.get(4, []):
+        row_groups.append({"rows": group.get(3, 0), "bytes": group.get(2, 0)})
+        for chunk in group.get(1, []):
+            chunk_meta = chunk.get(3) or {}
+            column = by_name.get(".".join(_text(p) for p in chunk_meta.get(3, [])))
+            if column is None:
+                continue
+            column["compressed"] += chunk_meta.get(7, 0)
+            column["uncompressed"] += chunk_meta.get(6, 0)
+            codec = chunk_meta.get(4, 0)
+            column["codec"] = CODECS[codec] if codec < len(CODECS) else str(codec)
+            stats = chunk_meta.get(12) or {}
+            column["nulls"] += stats.get(3, 0) or 0
+            is_text = column["logical"] in ("STRING", "UTF8", "ENUM", "JSON")
+            low = _stat(stats.get(6, stats.get(2)), column["type"], is_text)
+            high = _stat(stats.get(5, stats.get(1)), column["type"], is_text)
+            if low is not None and (column["min"] is None or low < column["min"]):
+                column["min"] = low
+            if high is not None and (column["max"] is None or high > column["max"]):
+                column["max"] = high
+    return {
+        "rows": meta.get(3, 0),
+        "row_groups": row_groups,
+        "columns": columns,
+        "created_by": _text(meta.get(6, b"")) or "",
+    }
+
+
+def parquet_rows(read, size, columns, start_row, limit, max_bytes):
+    """Rows ``start_row``..``start_row + limit`` of the selected columns (needs pyarrow)."""
+    if not PYARROW:
+        raise TabularError("Install pyarrow to preview Parquet rows")
+    import pyarrow.parquet as pq
+    source = RangedFile(read, size, max_bytes)
+    parquet = pq.ParquetFile(source, buffer_size=1024 * 1024, pre_buffer=False)
+    rows = []
+    first = 0
+    for group in range(parquet.num_row_groups):
+        group_rows = parquet.metadata.row_group(group).num_rows
+        if first + group_rows <= start_row:
+            first += group_rows
+            continue
+        skip = max(0, start_row - first)
+        for batch in parquet.iter_batches(batch_size=min(limit + skip, 65536), row_groups=[group], columns=columns):
+            batch_rows = batch.to_pylist()
+            rows.extend(batch_rows[skip:])
+            skip = max(0, skip - len(batch_rows))
+            if len(rows) >= limit:
+                return rows[:limit], source.fetched
+        first += group_rows
+    return rows, source.fetched
+
+
+class _LineFeed:
+    # Hands lines to csv.reader on demand, fetching further ranges as needed
+    # and counting the bytes consumed, so the next page starts on a row boundary.
+    def __init__(self, read, start, size, max_bytes):
+        self.read_range = read
+        self.next_fetch = start
+        self.size = size
+        self.max_bytes = max_bytes
+        self.chunk = 64 * 1024
+        self.buf = b""
+        self.at = 0
+        self.consumed = start
+        self.fetched = 0
+        self.exhausted = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            newline = self.buf.find(b"\n", self.at)
+            if newline != -1 or self.next_fetch >= self.size:
+                end = newline + 1 if newline != -1 else len(self.buf)
+                if end == self.at:
+                    raise StopIteration
+                line = self.buf[self.at:end]
+                self.at = end
+                self.consumed += len(line)
+                return line.decode("utf-8", errors="replace")
+            if self.fetched >= self.max_bytes:
+                self.exhausted = True
+                raise StopIteration
+            data = self.read_range(self.next_fetch, min(self.size, self.next_fetch + self.chunk) - 1)
+            self.next_fetch += len(data)
+            self.fetched += len(data)
+            self.buf = self.buf[self.at:] + data
+            self.at = 0
+            self.chunk = min(self.chunk * 2, 1024 * 1024)
+
+
+def csv_header(read, size, key):
+    """Sniff the dialect and read the header row; returns ``(dialect, header, data_offset)``."""
+    sample = read(0, min(size, SNIFF_BYTES) - 1) if size else b""
+    text = sample.decode("utf-8", errors="replace")
+    if key.lower().endswith(".tsv"):
+        dialect = csv.excel_tab
+    else:
+        try:
+            dialect = csv.Sniffer().sniff(text[:SNIFF_BYTES // 4], delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+    feed = _LineFeed(read, 0, size, SNIFF_BYTES * 4)
+    header = next(csv.reader(feed, dialect), [])
+    return dialect, header, feed.consumed
+
+
+def csv_rows(read, size, dialect, offset, limit, max_bytes):
+    """Parse up to ``limit`` rows from ``offset``; returns ``(rows, next_offset, fetched)``."""
+    feed = _LineFeed(read, offset, size, max_bytes)
+    rows = []
+    ends = []
+    try:
+        for row in csv.reader(feed, dialect):
+            rows.append(row)
+            ends.append(feed.consumed)
+            if len(rows) >= limit:
+                break
+    except csv.Error:
+        pass
+    if feed.exhausted and len(rows) < limit and rows:
+        # The budget ran out inside a row; it starts the next page instead.
+        rows.pop()
+        ends.pop()
+    if not rows and feed.exhausted:
+        raise TabularError(f"A row is larger than {max_bytes // (1024 * 1024)} MB")
+    end = ends[-1] if ends else offset
+    return rows, (end if end < size else None), feed.fetched
+
+
+def _value_kind(value):
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return "boolean"
+    try:
+        int(value)
+        return "integer"
+    except ValueError:
+        pass
+    try:
+        float(value)
+        return "float"
+    except ValueError:
+        pass
+    try:
+        datetime.date.fromisoformat(value)
+        return "date"
+    except ValueError:
+        pass
+    try:
+        datetime.datetime.fromisoformat(value)
+        return "timestamp"
+    except ValueError:
+        return "string"
+
+
+def infer_schema(header, rows):
+    """Column types guessed from the sampled rows; empty cells count as nulls."""
+    schema = []
+    for index, name in enumerate(header):
+        kinds = set()
+        nulls = 0
+        for row in rows:
+            value = row[index].strip() if index < len(row) else ""
+            if value:
+                kinds.add(_value_kind(value))
+            else:
+                nulls += 1
+        if not kinds:
+            kind = "empty"
+        elif len(kinds) == 1:
+            kind = kinds.pop()
+        elif kinds <= {"integer", "float"}:
+            kind = "float"
+        elif kinds <= {"date", "timestamp"}:
+            kind = "timestamp"
+        else:
+            kind = "string"
+        schema.append({"name": name, "type": kind, "nulls": nulls})
+    return schema
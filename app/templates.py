@@ -1,24 +1,46 @@
-"""Template loader for S3 File Manager."""
+"""Template loader for S3 File Manager.
 
+Templates and static assets are read once per process and split into
+literal and placeholder parts, so rendering is a single join and text coming
+in through a value is never searched for further placeholders.
+"""
+
+import functools
+import re
 from pathlib import Path
 
 _BASE_DIR = Path(__file__).parent / "templates"
+_STATIC_DIR = Path(__file__).parent / "static"
+_PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
 
 
+@functools.lru_cache(maxsize=None)
 def _load(name):
     return (_BASE_DIR / name).read_text(encoding="utf-8")
 
 
+@functools.lru_cache(maxsize=None)
+def _static(name):
+    return (_STATIC_DIR / name).read_text(encoding="utf-8")
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(raw):
+    # Odd indexes are placeholder names, even indexes literal text.
+    return tuple(_PLACEHOLDER.split(raw))
+
+
 def _render(raw, context):
-    out = raw
-    for key, value in context.items():
-        out = out.replace("{{" + key + "}}", str(value))
-    return out
+    parts = list(_compile(raw))
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        parts[i] = str(context[name]) if name in context else "{{" + name + "}}"
+    return "".join(parts)
 
 
 def render_page(title, body_html):
-    css = (Path(__file__).parent / "static" / "css" / "style.css").read_text(encoding="utf-8")
-    js = (Path(__file__).parent / "static" / "js" / "app.js").read_text(encoding="utf-8")
+    css = _static("css/style.css")
+    js = _static("js/app.js")
     base = _load("layouts/base.html")
     return _render(base, {"title": title, "css": css, "js": js, "body": body_html})
 
@@ -0,0 +1,125 @@
+"""Image thumbnails for S3 File Manager (optional, needs Pillow)."""
+
+import io
+import struct
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+HEAD_BYTES = 64 * 1024
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+# Share of the requested size an embedded EXIF preview must reach to be used as is.
+EXIF_MIN_RATIO = 0.6
+ORIENTATION_TRANSPOSE = {
+    2: ["FLIP_LEFT_RIGHT"],
+    3: ["ROTATE_180"],
+    4: ["FLIP_TOP_BOTTOM"],
+    5: ["TRANSPOSE"],
+    6: ["ROTATE_270"],
+    7: ["TRANSVERSE"],
+    8: ["ROTATE_90"],
+}
+
+
+def available():
+    return Image is not None
+
+
+def output_format():
+    if Image is not None and features.check("webp"):
+        return "WEBP", "image/webp"
+    return "JPEG", "image/jpeg"
+
+
+def supported(key):
+    return available() and key[key.rfind("."):].lower() in IMAGE_EXTENSIONS
+
+
+def _ifd_entries(tiff, offset, endian):
+    count = struct.unpack_from(endian + "H", tiff, offset)[0]
+    entries = {}
+    for i in range(count):
+        tag, kind, _, value = struct.unpack_from(endian + "HHI4s", tiff, offset + 2 + i * 12)
+        if kind == 3:
+            entries[tag] = struct.unpack_from(endian + "H", value)[0]
+        elif kind == 4:
+            entries[tag] = struct.unpack_from(endian + "I", value)[0]
+    next_ifd = struct.unpack_from(endian + "I", tiff, offset + 2 + count * 12)[0]
+    return entries, next_ifd
+
+
+def exif_preview(head):
+    """Return ``(jpeg_bytes, orientation)`` of the EXIF thumbnail in a JPEG's first bytes.
+
+    Only the APP1 segment is parsed, so ``head`` can be a short ranged read.
+    Returns ``(None, orientation)`` when the image has no embedded preview.
+    """
+    if head[:2] != b"\xff\xd8":
+        return None, 1
+    pos = 2
+    while pos + 4 <= len(head) and head[pos] == 0xFF:
+        marker = head[pos + 1]
+        length = struct.unpack_from(">H", head, pos + 2)[0]
+        if marker == 0xE1 and head[pos + 4:pos + 10] == b"Exif\0\0":
+            tiff = head[pos + 10:pos + 2 + length]
+            try:
+                endian = "<" if tiff[:2] == b"II" else ">"
+                ifd0, ifd1_offset = _ifd_entries(tiff, struct.unpack_from(endian + "I", tiff, 4)[0], endian)
+                orientation = ifd0.get(0x0112, 1)
+                if not ifd1_offset:
+                    return None, orientation
+                ifd1, _ = _ifd_entries(tiff, ifd1_offset, endian)
+                start, size = ifd1.get(0x0201), ifd1.get(0x0202)
+                if start and size and start + size <= len(tiff):
+                    return tiff[start:start + size], orientation
+                return None, orientation
+            except struct.error:
+                return None, 1
+        if marker == 0xDA:
+            break
+        pos += 2 + length
+    return None, 1
+
+
+def _orient(img, orientation):
+    for name in ORIENTATION_TRANSPOSE.get(orientation, []):
+        img = img.transpose(getattr(Image.Transpose, name))
+    return img
+
+
+def _encode(img, size):
+    img.thumbnail((size, size))
+    fmt, content_type = output_format()
+    if img.mode not in ("RGB", "RGBA") or (fmt == "JPEG" and img.mode == "RGBA"):
+        img = img.convert("RGBA" if fmt == "WEBP" and "A" in img.getbands() else "RGB")
+    out = io.BytesIO()
+    img.save(out, fmt, quality=80)
+    return out.getvalue(), content_type
+
+
+def from_exif(head, size):
+    """Thumbnail from the embedded EXIF preview, or None if it is missing or too small."""
+    preview, orientation = exif_preview(head)
+    if not preview:
+        return None
+    try:
+        img = Image.open(io.BytesIO(preview))
+        img.load()
+    except Exception:
+        return None
+    if max(img.size) < size * EXIF_MIN_RATIO:
+        return None
+    return _encode(_orient(img, orientation), size)
+
+
+def render(data, size):
+    """Thumbnail of a whole image file; returns ``(bytes, content_type)``."""
+    img = Image.open(io.BytesIO(data))
+    # JPEG decodes at 1/2, 1/4 or 1/8 scale when a draft size is set, which is
+    # most of the cost saved for large photos.
+    img.draft("RGB", (size, size))
+    orientation = img.getexif().get(0x0112, 1)
+    img.load()
+    return _encode(_orient(img, orientation), size)
@@ -0,0 +1,100 @@
+"""Recursive prefix usage (bytes and object counts) for S3 File Manager."""
+
+import threading
+import time
+
+import listcache
+import listing
+
+
+class PrefixUsage:
+    """Memoized recursive usage per (scope, bucket, prefix).
+
+    ``scope`` keeps users apart even when they share a bucket, so one user's
+    totals are never shown to another who could not list those folders.
+    A walk goes through the shared ``listing.KeyspaceLister`` and caches the
+    total of every folder under the prefix. Folders with a fresh total are
+    not listed again, so a later walk of an ancestor only lists what
+    changed. ``invalidate`` drops the ancestors of a changed key, which keeps
+    recomputation to the changed path.
+    """
+
+    def __init__(self, lister, ttl=300, max_entries=50000, max_lists=2000):
+        self.lister = lister
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_lists = max_lists
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.index = listcache.PrefixIndex()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope, bucket, prefix):
+        with self.lock:
+            entry = self.entries.get((scope, bucket, prefix))
+            if entry is None or time.time() - entry["at"] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def _store(self, scope, bucket, prefix, total, count):
+        with self.lock:
+            self.entries.pop((scope, bucket, prefix), None)
+            self.entries[(scope, bucket, prefix)] = {"bytes": total, "objects": count, "at": time.time()}
+            self.index.add(bucket, prefix, (scope, bucket, prefix))
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self.entries.pop(oldest)
+                self.index.discard(oldest[1], oldest[2], oldest)
+
+    def invalidate(self, bucket, key, subtree=False):
+        # Folder prefixes end in "/", so the prefixes of ``key`` are its ancestors.
+        with self.lock:
+            for k in self.index.pop(bucket, key, subtree or key.endswith("/")):
+                self.entries.pop(k, None)
+
+    def compute(self, client, scope, bucket, prefix):
+        """Return ``{"bytes", "objects", "complete"}`` for everything under ``prefix``."""
+        cached = self.get(scope, bucket, prefix)
+        if cached:
+            return {"bytes": cached["bytes"], "objects": cached["objects"], "complete": True}
+        reused = {}
+
+        def descend(folder):
+            # Runs on the lister's workers; each folder is offered once.
+            entry = self.get(scope, bucket, folder)
+            if entry is None:
+                return True
+            reused[folder] = (entry["bytes"], entry["objects"])
+            return False
+
+        folders = {prefix: [0, 0]}
+
+        def add(key, size, count):
+            # To every folder from ``prefix`` down to the one holding ``key``.
+            folders[prefix][0] += size
+            folders[prefix][1] += count
+            pos = key.find("/", len(prefix))
+            while pos != -1:
+                totals = folders.setdefault(key[:pos + 1], [0, 0])
+                totals[0] += size
+                totals[1] += count
+                pos = key.find("/", pos + 1)
+
+        complete = True
+        try:
+            for obj in self.lister.iter_objects(client, bucket, prefix, descend=descend, max_lists=self.max_lists):
+                add(obj["Key"], obj.get("Size", 0), 1)
+        except listing.ListLimit:
+            complete = False
+        for folder, (size, count) in reused.items():
+            # Without its trailing "/", so the reused total is not added to itself.
+            add(folder[:-1], size, count)
+        if complete:
+            # A partial walk does not say which folders it finished, so only a full one is kept.
+            for folder, (size, count) in folders.items():
+                self._store(scope, bucket, folder, size, count)
+        total, count = folders[prefix]
+        return {"bytes": total, "objects": count, "complete": complete}
@@ -0,0 +1,172 @@
+"""HTML fragments for the folder listing.
+
+Each object is escaped and quoted once, its table row and grid card come
+from the same values, and rows and cards are joined once per page instead of
+growing a string per object.
+"""
+
+import html
+import os
+import urllib.parse
+
+import thumbs
+
+UNITS = ("B", "KB", "MB", "GB", "TB")
+
+
+# Flush-left f-strings: one newline between tags renders the same as the
+# indentation this markup used to carry, and f-strings are several times
+# faster than str.format for a template this size.
+def folder_html(safe_name, safe_key, safe_uri, quoted_key, safe_prefix, safe_query):
+    row = f"""<tr data-kind="folder" data-name="{safe_name}" data-size="0" data-date="" data-key="{safe_key}">
+<td class='col-select'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"></td>
+<td>
+<span class='tag-folder'>
+<span class='folder-icon'></span>
+<span>{safe_name}</span>
+</span>
+</td>
+<td class='meta'>Folder</td>
+<td class='size' data-usage='{safe_key}'>--</td>
+<td class='meta'>--</td>
+<td class='actions'>
+<a class='link' href='/?prefix={quoted_key}'>Open</a>
+<a class='link' href='/download-zip?prefix={quoted_key}'>ZIP</a>
+<a class='link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+<form method='post' action='/delete' class='inline-form'>
+<input type='hidden' name='file' value='{safe_key}'>
+<input type='hidden' name='prefix' value='{safe_prefix}'>
+<input type='hidden' name='q' value='{safe_query}'>
+<button class='link danger' type='submit'>Delete</button>
+</form>
+<a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+</td>
+</tr>
+"""
+    card = f"""<div class='grid-item' data-kind="folder" data-name="{safe_name}" data-size="0" data-date="" data-key="{safe_key}">
+<div class='grid-head'>
+<span class='folder-icon'></span>
+<div class='grid-title'>{safe_name}</div>
+</div>
+<div class='grid-meta'>
+<span class='meta-pill'>Folder</span>
+<span class='meta-pill' data-usage='{safe_key}'>--</span>
+</div>
+<div class='grid-actions'>
+<a class='action-link' href='/?prefix={quoted_key}'>Open</a>
+<a class='action-link' href='/download-zip?prefix={quoted_key}'>ZIP</a>
+<a class='action-link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+<a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+<form method='post' action='/delete' class='inline-form'>
+<input type='hidden' name='file' value='{safe_key}'>
+<input type='hidden' name='prefix' value='{safe_prefix}'>
+<input type='hidden' name='q' value='{safe_query}'>
+<button class='action-link link danger' type='submit'>Delete</button>
+</form>
+</div>
+<label class='meta-pill'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"> Select</label>
+</div>
+"""
+    return row, card
+
+
+def file_html(safe_name, safe_key, safe_ext, safe_uri, quoted_key, quoted_prefix, size, size_label, date_label, modified_iso, thumb_html, safe_prefix, safe_query):
+    row = f"""<tr data-kind="file" data-name="{safe_name}" data-size="{size}" data-date="{modified_iso}" data-key="{safe_key}">
+<td class='col-select'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"></td>
+<td><span class='file-icon'></span>{safe_name}</td>
+<td class='meta'>{safe_ext}</td>
+<td class='size'>{size_label}</td>
+<td class='meta'>{date_label}</td>
+<td class='actions'>
+<a class='link' href='/download?file={quoted_key}'>Download</a>
+<a class='link' href='/preview?file={quoted_key}&prefix={quoted_prefix}' target='_blank'>Preview</a>
+<a class='link' href='/presign?file={quoted_key}&prefix={quoted_prefix}' target='_blank'>Share</a>
+<a class='link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+<form method='post' action='/delete' class='inline-form'>
+<input type='hidden' name='file' value='{safe_key}'>
+<input type='hidden' name='prefix' value='{safe_prefix}'>
+<input type='hidden' name='q' value='{safe_query}'>
+<button class='link danger' type='submit'>Delete</button>
+</form>
+<a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+</td>
+</tr>
+"""
+    card = f"""<div class='grid-item' data-kind="file" data-name="{safe_name}" data-size="{size}" data-date="{modified_iso}" data-key="{safe_key}">
+{thumb_html}
+<div class='grid-head'>
+<span class='file-icon'></span>
+<div class='grid-title'>{safe_name}</div>
+</div>
+<div class='grid-meta'>
+<span class='meta-pill'>{safe_ext}</span>
+<span class='meta-pill'>{size_label}</span>
+<span class='meta-pill'>{date_label}</span>
+</div>
+<div class='grid-actions'>
+<a class='action-link' href='/download?file={quoted_key}'>Download</a>
+<a class='action-link' href='/preview?file={quoted_key}&prefix={quoted_prefix}' target='_blank'>Preview</a>
+<a class='action-link' href='/presign?file={quoted_key}&prefix={quoted_prefix}' target='_blank'>Share</a>
+<a class='action-link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+<a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+<form method='post' action='/delete' class='inline-form'>
+<input type='hidden' name='file' value='{safe_key}'>
+<input type='hidden' name='prefix' value='{safe_prefix}'>
+<input type='hidden' name='q' value='{safe_query}'>
+<button class='action-link link danger' type='submit'>Delete</button>
+</form>
+</div>
+<label class='meta-pill'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"> Select</label>
+</div>
+"""
+    return row, card
+
+
+def format_size(size):
+    value = float(size)
+    for unit in UNITS:
+        if value < 1024 or unit == UNITS[-1]:
+            if unit == "B":
+                return f"{int(value)} {unit}"
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def format_date(dt):
+    # Same as strftime("%Y-%m-%d %H:%M"), without parsing a format per call.
+    try:
+        return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}"
+    except Exception:
+        return ""
+
+
+def listing_items(bucket, prefix, folders, files, safe_prefix, safe_query, thumb_src):
+    """Return ``(table rows, grid cards)`` for a page; ``thumb_src(key, etag)`` gives a thumbnail URL."""
+    escape = html.escape
+    quote = urllib.parse.quote
+    quoted_prefix = quote(prefix)
+    rows = []
+    cards = []
+    for pref in folders:
+        row, card = folder_html(
+            escape(pref[len(prefix):].strip("/")), escape(pref), escape(f"s3://{bucket}/{pref}"), quote(pref),
+            safe_prefix, safe_query,
+        )
+        rows.append(row)
+        cards.append(card)
+    for o in files:
+        key = o["Key"]
+        name = key[len(prefix):] if prefix and key.startswith(prefix) else key
+        modified = o.get("LastModified", "")
+        size = o.get("Size", 0)
+        thumb_html = ""
+        if thumbs.supported(name):
+            thumb_html = f"<div class='grid-thumb'><img alt='' data-thumb='{escape(thumb_src(key, o.get('ETag', '')))}'></div>"
+        row, card = file_html(
+            escape(name), escape(key), escape(os.path.splitext(name)[1].replace(".", "").upper() or "FILE"),
+            escape(f"s3://{bucket}/{key}"), quote(key), quoted_prefix, size, format_size(size), format_date(modified),
+            modified.isoformat() if hasattr(modified, "isoformat") else "", thumb_html, safe_prefix, safe_query,
+        )
+        rows.append(row)
+        cards.append(card)
+    return "".join(rows), "".join(cards)
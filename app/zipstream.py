@@ -0,0 +1,92 @@
+"""Streaming ZIP64 writer for S3 File Manager archive downloads.
+
+Entries are written strictly in order to a forward-only stream: each local
+header carries zero sizes and the CRC and sizes follow the data in a ZIP64
+data descriptor, so nothing is buffered or seeked. Only the central directory
+records (a few dozen bytes per entry) are kept until ``close()``.
+"""
+
+import datetime
+import struct
+import zlib
+
+ZIP64_VERSION = 45
+FLAG_DATA_DESCRIPTOR = 0x0008
+FLAG_UTF8 = 0x0800
+UNIX_SYSTEM = 3 << 8
+
+
+def dos_datetime(dt):
+    if dt is None:
+        dt = datetime.datetime.now(datetime.timezone.utc)
+    if dt.year < 1980:
+        dt = datetime.datetime(1980, 1, 1)
+    dos_time = (dt.hour << 11) | (dt.minute << 5) | (dt.second // 2)
+    dos_date = ((dt.year - 1980) << 9) | (dt.month << 5) | dt.day
+    return dos_time, dos_date
+
+
+class ZipStream:
+    def __init__(self, out):
+        self.out = out
+        self.offset = 0
+        self.entries = []
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def add(self, name, chunks, modified=None):
+        """Write one entry; ``chunks`` yields its bytes. Names ending in ``/`` are folders."""
+        encoded = name.encode("utf-8")
+        flags = FLAG_DATA_DESCRIPTOR | FLAG_UTF8
+        dos_time, dos_date = dos_datetime(modified)
+        header_offset = self.offset
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+        self._write(struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50, ZIP64_VERSION, flags, 0, dos_time, dos_date,
+            0, 0xFFFFFFFF, 0xFFFFFFFF, len(encoded), len(extra),
+        ))
+        self._write(encoded)
+        self._write(extra)
+        crc = 0
+        size = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            self._write(chunk)
+        self._write(struct.pack("<IIQQ", 0x08074B50, crc, size, size))
+        is_dir = name.endswith("/")
+        mode = (0o40755 << 16) | 0x10 if is_dir else 0o100644 << 16
+        self.entries.append((encoded, flags, dos_time, dos_date, crc, size, header_offset, mode))
+        return size
+
+    def close(self):
+        cd_offset = self.offset
+        for encoded, flags, dos_time, dos_date, crc, size, header_offset, mode in self.entries:
+            extra = struct.pack("<HHQQQ", 0x0001, 24, size, size, header_offset)
+            self._write(struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50, UNIX_SYSTEM | ZIP64_VERSION, ZIP64_VERSION, flags, 0,
+                dos_time, dos_date, crc, 0xFFFFFFFF, 0xFFFFFFFF,
+                len(encoded), len(extra), 0, 0, 0, mode, 0xFFFFFFFF,
+            ))
+            self._write(encoded)
+            self._write(extra)
+        cd_size = self.offset - cd_offset
+        eocd64_offset = self.offset
+        count = len(self.entries)
+        self._write(struct.pack(
+            "<IQHHIIQQQQ",
+            0x06064B50, 44, UNIX_SYSTEM | ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+            count, count, cd_size, cd_offset,
+        ))
+        self._write(struct.pack("<IIQI", 0x07064B50, 0, eocd64_offset, 1))
+        self._write(struct.pack(
+            "<IHHHHIIH",
+            0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF), 0,
+        ))
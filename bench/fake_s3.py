@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""In-process S3 stand-in for benchmarks.
+
+Serves one bucket over the S3 REST API (path-style) with just enough of it
+for the app: ListObjectsV2, GetObject with ranges, HeadObject, PutObject,
+CopyObject, DeleteObject and multipart uploads. The bucket starts with
+``keys`` synthetic objects laid out as ``data/d00000/obj00000000.bin``
+(``per_dir`` objects per folder) whose bodies are generated from the key, so
+a million keys cost only the sorted key list in memory. Requests are not
+authenticated and conditional headers are ignored.
+
+    python3 bench/fake_s3.py --keys 1000000 --port 9000
+    S3FM_S3_ENDPOINT=http://127.0.0.1:9000 python3 app/server.py
+"""
+
+import argparse
+import base64
+import bisect
+import collections
+import datetime
+import hashlib
+import http.server
+import threading
+import urllib.parse
+import uuid
+from xml.sax.saxutils import escape
+
+NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def http_date(dt):
+    return dt.strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+
+class Store:
+    def __init__(self, keys=10000, per_dir=10000, object_size=16 * 1024):
+        self.lock = threading.Lock()
+        self.object_size = object_size
+        self.keys = [f"data/d{i // per_dir:05d}/obj{i:08d}.bin" for i in range(keys)]
+        self.written = {}
+        self.deleted = set()
+        self.uploads = {}
+        self.calls = collections.Counter()
+
+    # ---------- objects ----------
+    def body(self, key):
+        with self.lock:
+            if key in self.written:
+                return self.written[key]
+            if key in self.deleted:
+                return None
+            index = bisect.bisect_left(self.keys, key)
+            if index == len(self.keys) or self.keys[index] != key:
+                return None
+        seed = hashlib.sha256(key.encode("utf-8")).digest()
+        block = seed * (1024 // len(seed))
+        data = (block * (self.object_size // len(block) + 1))[:self.object_size]
+        return data, '"' + hashlib.md5(data).hexdigest() + '"', EPOCH
+
+    def put(self, key, data):
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        with self.lock:
+            self.written[key] = (data, etag, datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0))
+            self.deleted.discard(key)
+            index = bisect.bisect_left(self.keys, key)
+            if index == len(self.keys) or self.keys[index] != key:
+                self.keys.insert(index, key)
+        return etag
+
+    def delete(self, key):
+        with self.lock:
+            self.written.pop(key, None)
+            index = bisect.bisect_left(self.keys, key)
+            if index < len(self.keys) and self.keys[index] == key:
+                del self.keys[index]
+                self.deleted.add(key)
+
+    def size_of(self, key):
+        with self.lock:
+            if key in self.written:
+                return len(self.written[key][0])
+        return self.object_size
+
+    # ---------- listing ----------
+    def list(self, prefix="", delimiter="", max_keys=1000, start_after="", token=""):
+        # Tokens are "K<key>" after an object and "P<prefix>" after a common prefix.
+        marker = base64.urlsafe_b64decode(token.encode()).decode("utf-8") if token else "K" + start_after
+        kind, after = marker[:1], marker[1:]
+        contents = []
+        prefixes = []
+        with self.lock:
+            if kind == "P":
+                # Resume after a common prefix: skip every key under it.
+                pos = bisect.bisect_left(self.keys, after[:-1] + chr(ord(after[-1]) + 1))
+            else:
+                pos = bisect.bisect_right(self.keys, after) if after else 0
+            pos = max(pos, bisect.bisect_left(self.keys, prefix))
+            last = ""
+            while pos < len(self.keys) and len(contents) + len(prefixes) < max_keys:
+                key = self.keys[pos]
+                if not key.startswith(prefix):
+                    break
+                cut = key.find(delimiter, len(prefix)) if delimiter else -1
+                if cut != -1:
+                    common = key[:cut + len(delimiter)]
+                    prefixes.append(common)
+                    last = "P" + common
+                    pos = bisect.bisect_left(self.keys, common[:-1] + chr(ord(common[-1]) + 1))
+                    continue
+                contents.append(key)
+                last = "K" + key
+                pos += 1
+            truncated = pos < len(self.keys) and self.keys[pos].startswith(prefix)
+        sizes = [(key, self.size_of(key)) for key in contents]
+        next_token = base64.urlsafe_b64encode(last.encode("utf-8")).decode() if truncated else ""
+        return sizes, prefixes, next_token
+
+
+class S3Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def parse(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        parts = url.path.lstrip("/").split("/", 1)
+        bucket = urllib.parse.unquote(parts[0])
+        key = urllib.parse.unquote(parts[1]) if len(parts) > 1 else ""
+        return bucket, key, {name: values[0] for name, values in query.items()}
+
+    def reply(self, status, body=b"", headers=None, head=False):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+    def xml(self, status, body):
+        self.reply(status, ('<?xml version="1.0" encoding="UTF-8"?>' + body).encode("utf-8"), {"Content-Type": "application/xml"})
+
+    def error(self, status, code, head=False):
+        if head:
+            return self.reply(status, head=True)
+        return self.xml(status, f"<Error><Code>{code}</Code><Message>{code}</Message></Error>")
+
+    def read_body(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            raw = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if not size:
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                raw += self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            raw = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        if "aws-chunked" in self.headers.get("Content-Encoding", "") or self.headers.get("x-amz-decoded-content-length"):
+            # Streaming payload with trailing checksum: <hex size>[;sig]\r\n<data>\r\n ... 0\r\n<trailers>
+            data = b""
+            pos = 0
+            while pos < len(raw):
+                end = raw.index(b"\r\n", pos)
+                size = int(raw[pos:end].split(b";")[0], 16)
+                if not size:
+                    break
+                data += raw[end + 2:end + 2 + size]
+                pos = end + 2 + size + 2
+            return data
+        return raw
+
+    def do_GET(self, head=False):
+        bucket, key, query = self.parse()
+        if not key:
+            self.store.calls["ListObjectsV2"] += 1
+            return self.list_objects(bucket, query)
+        self.store.calls["HeadObject" if head else "GetObject"] += 1
+        found = self.store.body(key)
+        if found is None:
+            return self.error(404, "NoSuchKey", head)
+        data, etag, modified = found
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(modified),
+            "Content-Type": "application/octet-stream",
+            "Accept-Ranges": "bytes",
+        }
+        status = 200
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            first, _, last = byte_range[6:].partition("-")
+            size = len(data)
+            if first:
+                start, end = int(first), min(size - 1, int(last) if last else size - 1)
+            else:
+                start, end = max(0, size - int(last)), size - 1
+            if start >= size:
+                headers["Content-Range"] = f"bytes */{size}"
+                return self.reply(416, b"", headers)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            data = data[start:end + 1]
+            status = 206
+        self.reply(status, data, headers, head=head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def list_objects(self, bucket, query):
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter", "")
+        max_keys = max(1, min(1000, int(query.get("max-keys", "1000"))))
+        token = query.get("continuation-token", "")
+        contents, prefixes, next_token = self.store.list(prefix, delimiter, max_keys, query.get("start-after", ""), token)
+        parts = [
+            f'<ListBucketResult xmlns="{NS}"><Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>',
+            f"<KeyCount>{len(contents) + len(prefixes)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>",
+            f"<Delimiter>{escape(delimiter)}</Delimiter>" if delimiter else "",
+            f"<IsTruncated>{'true' if next_token else 'false'}</IsTruncated>",
+            f"<ContinuationToken>{escape(token)}</ContinuationToken>" if token else "",
+            f"<NextContinuationToken>{next_token}</NextContinuationToken>" if next_token else "",
+        ]
+        for key, size in contents:
+            parts.append(
+                f"<Contents><Key>{escape(key)}</Key><LastModified>{iso(EPOCH)}</LastModified>"
+                f'<ETag>"{hashlib.md5(key.encode()).hexdigest()}"</ETag><Size>{size}</Size>'
+                "<StorageClass>STANDARD</StorageClass></Contents>"
+            )
+        for common in prefixes:
+            parts.append(f"<CommonPrefixes><Prefix>{escape(common)}</Prefix></CommonPrefixes>")
+        parts.append("</ListBucketResult>")
+        self.xml(200, "".join(parts))
+
+    def do_PUT(self):
+        bucket, key, query = self.parse()
+        body = self.read_body()
+        if "partNumber" in query:
+            self.store.calls["UploadPart"] += 1
+            parts = self.store.uploads.get(query.get("uploadId"))
+            if parts is None:
+                return self.error(404, "NoSuchUpload")
+            parts[int(query["partNumber"])] = body
+            return self.reply(200, b"", {"ETag": '"' + hashlib.md5(body).hexdigest() + '"'})
+        source = self.headers.get("x-amz-copy-source")
+        if source:
+            self.store.calls["CopyObject"] += 1
+            src_key = urllib.parse.unquote(source.lstrip("/")).split("/", 1)[1]
+            found = self.store.body(src_key)
+            if found is None:
+                return self.error(404, "NoSuchKey")
+            etag = self.store.put(key, found[0])
+            return self.xml(200, f"<CopyObjectResult><LastModified>{iso(EPOCH)}</LastModified><ETag>{escape(etag)}</ETag></CopyObjectResult>")
+        self.store.calls["PutObject"] += 1
+        self.reply(200, b"", {"ETag": self.store.put(key, body)})
+
+    def do_POST(self):
+        bucket, key, query = self.parse()
+        body = self.read_body()
+        if "uploads" in query:
+            self.store.calls["CreateMultipartUpload"] += 1
+            upload_id = uuid.uuid4().hex
+            self.store.uploads[upload_id] = {}
+            return self.xml(200, (
+                f'<InitiateMultipartUploadResult xmlns="{NS}"><Bucket>{escape(bucket)}</Bucket>'
+                f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            ))
+        if "uploadId" in query:
+            self.store.calls["CompleteMultipartUpload"] += 1
+            parts = self.store.uploads.pop(query["uploadId"], None)
+            if parts is None:
+                return self.error(404, "NoSuchUpload")
+            etag = self.store.put(key, b"".join(parts[n] for n in sorted(parts)))
+            return self.xml(200, (
+                f'<CompleteMultipartUploadResult xmlns="{NS}"><Bucket>{escape(bucket)}</Bucket>'
+                f"<Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>"
+            ))
+        self.error(400, "NotImplemented")
+
+    def do_DELETE(self):
+        bucket, key, query = self.parse()
+        if "uploadId" in query:
+            self.store.calls["AbortMultipartUpload"] += 1
+            self.store.uploads.pop(query["uploadId"], None)
+        else:
+            self.store.calls["DeleteObject"] += 1
+            self.store.delete(key)
+        self.reply(204)
+
+
+def serve(store, host="127.0.0.1", port=0):
+    """Start the fake in a daemon thread; returns ``(server, endpoint_url)``."""
+    handler = type("BoundS3Handler", (S3Handler,), {"store": store})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-s3", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--per-dir", type=int, default=10000)
+    parser.add_argument("--object-kb", type=int, default=16)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    store = Store(args.keys, args.per_dir, args.object_kb * 1024)
+    server, url = serve(store, args.host, args.port)
+    print(f"Fake S3 with {args.keys} keys at {url} (any bucket name, any credentials)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
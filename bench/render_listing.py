@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Microbenchmark for the folder listing render path.
+
+Renders synthetic list_objects_v2 pages of 100, 1000 and 10000 objects with
+the old per-object f-string loop and replace-chain template render, and with
+views.listing_items and the compiled templates. Checks that both produce the
+same HTML (whitespace aside) and reports best-of-N time, time per object,
+output size and tracemalloc peak.
+
+    python3 bench/render_listing.py --sizes 100 1000 10000 --repeat 5
+"""
+
+import argparse
+import datetime
+import html
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+import urllib.parse
+from pathlib import Path
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+import templates
+import thumbs
+import views
+
+BUCKET = "bench"
+PREFIX = "projects/2024/"
+EXTENSIONS = ("jpg", "png", "csv", "parquet", "txt", "json", "pdf", "zip", "log", "tar.gz")
+
+
+def synthetic_page(count):
+    # Roughly what one list_objects_v2 page under a busy prefix looks like:
+    # one folder per 20 objects, mixed extensions, some names that need escaping.
+    base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    folders = [f"{PREFIX}batch-{i:04d}/" for i in range(max(1, count // 20))]
+    files = []
+    for i in range(count - len(folders)):
+        name = f"report {i:06d} & 'draft'.{EXTENSIONS[i % len(EXTENSIONS)]}" if i % 7 == 0 else f"obj-{i:06d}.{EXTENSIONS[i % len(EXTENSIONS)]}"
+        files.append({
+            "Key": PREFIX + name,
+            "Size": (i * 7919) % (50 * 1024 * 1024),
+            "LastModified": base + datetime.timedelta(minutes=i * 13),
+            "ETag": f'"{i:032x}"',
+        })
+    return folders, files
+
+
+def thumb_src(key, etag, size=256):
+    return f"/thumb?file={urllib.parse.quote(key)}&v={urllib.parse.quote(etag)}&s={size}"
+
+
+def legacy_format_size(size):
+    units = ["B", "KB", "MB", "GB", "TB"]
+    value = float(size)
+    for unit in units:
+        if value < 1024 or unit == units[-1]:
+            if unit == "B":
+                return f"{int(value)} {unit}"
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def legacy_format_date(dt):
+    try:
+        return dt.strftime("%Y-%m-%d %H:%M")
+    except Exception:
+        return ""
+
+
+def legacy_items(bucket, prefix, folders, files, safe_prefix, safe_query):
+    # The listing loop as it was in server.py route_get before views.py.
+    folder_rows = ""
+    folder_cards = ""
+    for pref in folders:
+        name = pref[len(prefix):].strip("/")
+        safe_name = html.escape(name)
+        safe_key = html.escape(pref)
+        safe_uri = html.escape(f"s3://{bucket}/{pref}")
+        folder_rows += f"""
+            <tr data-kind="folder" data-name="{safe_name}" data-size="0" data-date="" data-key="{safe_key}">
+              <td class='col-select'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"></td>
+              <td>
+                <span class='tag-folder'>
+                  <span class='folder-icon'></span>
+                  <span>{safe_name}</span>
+                </span>
+              </td>
+              <td class='meta'>Folder</td>
+              <td class='size' data-usage='{safe_key}'>--</td>
+              <td class='meta'>--</td>
+              <td class='actions'>
+                <a class='link' href='/?prefix={urllib.parse.quote(pref)}'>Open</a>
+                <a class='link' href='/download-zip?prefix={urllib.parse.quote(pref)}'>ZIP</a>
+                <a class='link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+                <form method='post' action='/delete' class='inline-form'>
+                  <input type='hidden' name='file' value='{safe_key}'>
+                  <input type='hidden' name='prefix' value='{safe_prefix}'>
+                  <input type='hidden' name='q' value='{safe_query}'>
+                  <button class='link danger' type='submit'>Delete</button>
+                </form>
+                <a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+              </td>
+            </tr>
+            """
+        folder_cards += f"""
+            <div class='grid-item' data-kind="folder" data-name="{safe_name}" data-size="0" data-date="" data-key="{safe_key}">
+              <div class='grid-head'>
+                <span class='folder-icon'></span>
+                <div class='grid-title'>{safe_name}</div>
+              </div>
+              <div class='grid-meta'>
+                <span class='meta-pill'>Folder</span>
+                <span class='meta-pill' data-usage='{safe_key}'>--</span>
+              </div>
+              <div class='grid-actions'>
+                <a class='action-link' href='/?prefix={urllib.parse.quote(pref)}'>Open</a>
+                <a class='action-link' href='/download-zip?prefix={urllib.parse.quote(pref)}'>ZIP</a>
+                <a class='action-link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+                <a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+                <form method='post' action='/delete' class='inline-form'>
+                  <input type='hidden' name='file' value='{safe_key}'>
+                  <input type='hidden' name='prefix' value='{safe_prefix}'>
+                  <input type='hidden' name='q' value='{safe_query}'>
+                  <button class='action-link link danger' type='submit'>Delete</button>
+                </form>
+              </div>
+              <label class='meta-pill'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"> Select</label>
+            </div>
+            """
+
+    file_rows = ""
+    file_cards = ""
+    for o in files:
+        name = o["Key"][len(prefix):] if prefix and o["Key"].startswith(prefix) else o["Key"]
+        ext = os.path.splitext(name)[1].replace(".", "").upper() or "FILE"
+        modified = o.get("LastModified", "")
+        modified_iso = modified.isoformat() if hasattr(modified, "isoformat") else ""
+        safe_name = html.escape(name)
+        safe_key = html.escape(o["Key"])
+        safe_ext = html.escape(ext)
+        safe_uri = html.escape(f"s3://{bucket}/{o['Key']}")
+        file_rows += f"""
+            <tr data-kind="file" data-name="{safe_name}" data-size="{o.get('Size', 0)}" data-date="{modified_iso}" data-key="{safe_key}">
+              <td class='col-select'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"></td>
+              <td><span class='file-icon'></span>{safe_name}</td>
+              <td class='meta'>{safe_ext}</td>
+              <td class='size'>{legacy_format_size(o.get("Size", 0))}</td>
+              <td class='meta'>{legacy_format_date(modified)}</td>
+              <td class='actions'>
+                <a class='link' href='/download?file={urllib.parse.quote(o["Key"])}'>Download</a>
+                <a class='link' href='/preview?file={urllib.parse.quote(o["Key"])}&prefix={urllib.parse.quote(prefix)}' target='_blank'>Preview</a>
+                <a class='link' href='/presign?file={urllib.parse.quote(o["Key"])}&prefix={urllib.parse.quote(prefix)}' target='_blank'>Share</a>
+                <a class='link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+                <form method='post' action='/delete' class='inline-form'>
+                  <input type='hidden' name='file' value='{safe_key}'>
+                  <input type='hidden' name='prefix' value='{safe_prefix}'>
+                  <input type='hidden' name='q' value='{safe_query}'>
+                  <button class='link danger' type='submit'>Delete</button>
+                </form>
+                <a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+              </td>
+            </tr>
+            """
+        thumb_html = ""
+        if thumbs.supported(name):
+            thumb_html = f"<div class='grid-thumb'><img alt='' data-thumb='{html.escape(thumb_src(o['Key'], o.get('ETag', '')))}'></div>"
+        file_cards += f"""
+            <div class='grid-item' data-kind="file" data-name="{safe_name}" data-size="{o.get('Size', 0)}" data-date="{modified_iso}" data-key="{safe_key}">
+              {thumb_html}
+              <div class='grid-head'>
+                <span class='file-icon'></span>
+                <div class='grid-title'>{safe_name}</div>
+              </div>
+              <div class='grid-meta'>
+                <span class='meta-pill'>{safe_ext}</span>
+                <span class='meta-pill'>{legacy_format_size(o.get("Size", 0))}</span>
+                <span class='meta-pill'>{legacy_format_date(modified)}</span>
+              </div>
+              <div class='grid-actions'>
+                <a class='action-link' href='/download?file={urllib.parse.quote(o["Key"])}'>Download</a>
+                <a class='action-link' href='/preview?file={urllib.parse.quote(o["Key"])}&prefix={urllib.parse.quote(prefix)}' target='_blank'>Preview</a>
+                <a class='action-link' href='/presign?file={urllib.parse.quote(o["Key"])}&prefix={urllib.parse.quote(prefix)}' target='_blank'>Share</a>
+                <a class='action-link' href='#' data-rename='{safe_key}' data-name='{safe_name}'>Rename</a>
+                <a class='action-link' href='#' data-copy='{safe_uri}'>Copy URI</a>
+                <form method='post' action='/delete' class='inline-form'>
+                  <input type='hidden' name='file' value='{safe_key}'>
+                  <input type='hidden' name='prefix' value='{safe_prefix}'>
+                  <input type='hidden' name='q' value='{safe_query}'>
+                  <button class='action-link link danger' type='submit'>Delete</button>
+                </form>
+              </div>
+              <label class='meta-pill'><input class='checkbox row-select' type='checkbox' data-key="{safe_key}"> Select</label>
+            </div>
+            """
+    return folder_rows + file_rows, folder_cards + file_cards
+
+
+def legacy_render(raw, context):
+    out = raw
+    for key, value in context.items():
+        out = out.replace("{{" + key + "}}", str(value))
+    return out
+
+
+def legacy_main_page(content_html):
+    # templates.render_main_page before it cached files and compiled placeholders.
+    app = Path(APP_DIR)
+    body = legacy_render((app / "templates" / "pages" / "main.html").read_text(encoding="utf-8"), {"content": content_html})
+    css = (app / "static" / "css" / "style.css").read_text(encoding="utf-8")
+    js = (app / "static" / "js" / "app.js").read_text(encoding="utf-8")
+    base = (app / "templates" / "layouts" / "base.html").read_text(encoding="utf-8")
+    return legacy_render(base, {"title": "S3 File Manager", "css": css, "js": js, "body": body})
+
+
+def page_content(rows, cards):
+    # Stand-in for the rest of the listing markup around the rows and cards.
+    return f"<table><tbody>{rows}</tbody></table><div class='grid'>{cards}</div>"
+
+
+def render_legacy(folders, files):
+    rows, cards = legacy_items(BUCKET, PREFIX, folders, files, html.escape(PREFIX), "")
+    return legacy_main_page(page_content(rows, cards))
+
+
+def render_views(folders, files):
+    rows, cards = views.listing_items(BUCKET, PREFIX, folders, files, html.escape(PREFIX), "", thumb_src)
+    return templates.render_main_page(page_content(rows, cards))
+
+
+RENDERERS = {"legacy": render_legacy, "views": render_views}
+
+
+def normalized(markup):
+    # Whitespace runs collapse to one space in HTML, and between these block tags to nothing.
+    return " ".join(markup.split()).replace("> <", "><")
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run_case(name, count, folders, files, repeat):
+    fn = RENDERERS[name]
+    fn(folders, files)
+    loops = max(1, 2000 // count)
+    best = min(timeit.repeat(lambda: fn(folders, files), number=loops, repeat=repeat)) / loops
+    peak = peak_memory(lambda: fn(folders, files))
+    return {
+        "renderer": name,
+        "objects": count,
+        "ms": round(best * 1000, 3),
+        "us_per_object": round(best * 1e6 / count, 2),
+        "output_kb": round(len(fn(folders, files).encode("utf-8")) / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case; the best is reported")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for count in args.sizes:
+        folders, files = synthetic_page(count)
+        if normalized(render_legacy(folders, files)) != normalized(render_views(folders, files)):
+            sys.exit(f"views output differs from the legacy render at {count} objects")
+        for name in RENDERERS:
+            results.append(run_case(name, count, folders, files, args.repeat))
+
+    print(f"{'renderer':<10} {'objects':>8} {'ms':>10} {'us/obj':>8} {'out KB':>9} {'peak KB':>9}")
+    for row in results:
+        print(f"{row['renderer']:<10} {row['objects']:>8} {row['ms']:>10} {row['us_per_object']:>8} "
+              f"{row['output_kb']:>9} {row['peak_kb']:>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"sizes": args.sizes, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
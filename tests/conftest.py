@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app's modules import each other by bare name, as server.py arranges.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
@@ -0,0 +1,139 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import listcache
+import listing
+import usage
+
+PAGE = {"Contents": [], "IsTruncated": False}
+
+
+def page_key(prefix, scope=1, bucket="b"):
+    return (scope, bucket, prefix, "", 1000, "")
+
+
+def cached(cache, *prefixes):
+    return {prefix for prefix in prefixes if cache.contains(page_key(prefix))}
+
+
+def test_listing_cache_drops_prefixes_of_the_key():
+    cache = listcache.ListingCache(ttl=60)
+    for prefix in ("", "a/", "a/b/", "a/bc", "a/c/", "z/"):
+        cache.put(page_key(prefix), PAGE, cache.generation("b"))
+    cache.put(page_key("a/", bucket="other"), PAGE, cache.generation("other"))
+    cache.invalidate("b", "a/b/file.txt")
+    assert cached(cache, "", "a/", "a/b/", "a/bc", "a/c/", "z/") == {"a/bc", "a/c/", "z/"}
+    assert cache.contains(page_key("a/", bucket="other"))
+
+
+def test_listing_cache_subtree():
+    cache = listcache.ListingCache(ttl=60)
+    for prefix in ("", "a/", "a/b/", "a/b/c/", "ab/"):
+        cache.put(page_key(prefix), PAGE, cache.generation("b"))
+    cache.invalidate("b", "a/", subtree=True)
+    assert cached(cache, "", "a/", "a/b/", "a/b/c/", "ab/") == {"ab/"}
+
+
+def test_listing_cache_eviction_keeps_index_in_step():
+    cache = listcache.ListingCache(ttl=60, max_entries=2)
+    for prefix in ("a/", "b/", "c/"):
+        cache.put(page_key(prefix), PAGE, cache.generation("b"))
+    assert cache.index.buckets["b"].keys() == {"b/", "c/"}
+    cache.invalidate("b", "c/x")
+    assert cache.index.buckets["b"].keys() == {"b/"}
+
+
+def test_page_index_invalidate():
+    pages = listcache.PageIndex()
+    for prefix in ("", "a/", "b/"):
+        pages.record((1, "b", prefix, 1000), 1, "token")
+    pages.invalidate("b", "a/x")
+    assert [pages.nearest((1, "b", prefix, 1000), 2) for prefix in ("", "a/", "b/")] == [
+        (1, ""), (1, ""), (2, "token"),
+    ]
+
+
+class FakeS3:
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.listed = []
+
+    def list_objects_v2(self, Bucket, Prefix, Delimiter, **kwargs):
+        self.listed.append(Prefix)
+        contents, folders = [], set()
+        for key, size in sorted(self.sizes.items()):
+            if key.startswith(Prefix):
+                rest = key[len(Prefix):]
+                if "/" in rest:
+                    folders.add(Prefix + rest.split("/", 1)[0] + "/")
+                else:
+                    contents.append({"Key": key, "Size": size})
+        return {"Contents": contents, "CommonPrefixes": [{"Prefix": f} for f in sorted(folders)], "IsTruncated": False}
+
+
+SIZES = {"top.txt": 1, "a/one": 2, "a/c/two": 4, "b/three": 8}
+
+
+@pytest.fixture
+def lister():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield listing.KeyspaceLister(pool)
+    pool.shutdown(wait=True)
+
+
+def test_usage_totals_every_folder(lister):
+    totals = usage.PrefixUsage(lister)
+    assert totals.compute(FakeS3(SIZES), 1, "b", "") == {"bytes": 15, "objects": 4, "complete": True}
+    assert [totals.get(1, "b", p)["bytes"] for p in ("a/", "a/c/", "b/")] == [6, 4, 8]
+
+
+def test_usage_reuses_fresh_subfolder_totals(lister):
+    totals = usage.PrefixUsage(lister)
+    s3 = FakeS3(SIZES)
+    totals.compute(s3, 1, "b", "a/")
+    s3.listed.clear()
+    totals.invalidate("b", "top.txt")
+    assert totals.compute(s3, 1, "b", "") == {"bytes": 15, "objects": 4, "complete": True}
+    assert sorted(s3.listed) == ["", "b/"]
+
+
+def test_usage_list_budget_gives_a_lower_bound(lister):
+    totals = usage.PrefixUsage(lister, max_lists=1)
+    result = totals.compute(FakeS3(SIZES), 1, "b", "")
+    assert not result["complete"]
+    assert totals.entries == {}
+
+
+def test_usage_invalidate_drops_ancestors_for_every_scope(lister):
+    totals = usage.PrefixUsage(lister)
+    for scope in (1, 2):
+        assert totals.compute(FakeS3(SIZES), scope, "b", "")["bytes"] == 15
+    totals.invalidate("b", "a/c/new.txt")
+    for scope in (1, 2):
+        assert [totals.get(scope, "b", p) is not None for p in ("", "a/", "a/c/", "b/")] == [False, False, False, True]
+
+
+def test_usage_failure_stops_the_walk():
+    started = []
+    release = threading.Event()
+
+    class Failing:
+        def list_objects_v2(self, Bucket, Prefix, Delimiter, **kwargs):
+            started.append(Prefix)
+            if Prefix == "":
+                return {"CommonPrefixes": [{"Prefix": f"{n}/"} for n in range(10)]}
+            if Prefix == "0/":
+                raise RuntimeError("denied")
+            release.wait(5)
+            return {"Contents": [{"Key": Prefix + "x", "Size": 1}], "IsTruncated": True, "NextContinuationToken": "more"}
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    with pytest.raises(RuntimeError):
+        usage.PrefixUsage(listing.KeyspaceLister(pool, split=False)).compute(Failing(), 1, "b", "")
+    release.set()
+    pool.shutdown(wait=True)
+    # The root, the failing folder and the one running beside it; the queued rest never ran,
+    # and the running one stopped after its page instead of following "more".
+    assert len(started) <= 3
@@ -0,0 +1,90 @@
+import bisect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import listing
+
+KEYS = sorted(
+    {f"p/{folder}/{n:05d}" for folder in "abcd" for n in range(0, 6000, 3)}
+    | {f"p/z{n:04d}" for n in range(2500)}
+    | {f"p/x/y/{n}" for n in range(50)}
+)
+
+
+class FakeS3:
+    """``list_objects_v2`` over ``KEYS`` with 1000-name pages, like S3 with a ``/`` delimiter."""
+
+    def list_objects_v2(self, Bucket, Prefix, Delimiter, ContinuationToken="", StartAfter=""):
+        after = ContinuationToken or StartAfter
+        i = bisect.bisect_right(KEYS, after) if after else bisect.bisect_left(KEYS, Prefix)
+        contents, prefixes, last = [], [], ""
+        while i < len(KEYS) and KEYS[i].startswith(Prefix) and len(contents) + len(prefixes) < 1000:
+            rest = KEYS[i][len(Prefix):]
+            if "/" in rest:
+                folder = Prefix + rest.split("/", 1)[0] + "/"
+                prefixes.append({"Prefix": folder})
+                last = folder + "\U0010ffff"
+                i = bisect.bisect_left(KEYS, last)
+            else:
+                contents.append({"Key": KEYS[i]})
+                last = KEYS[i]
+                i += 1
+        more = i < len(KEYS) and KEYS[i].startswith(Prefix)
+        return {"Contents": contents, "CommonPrefixes": prefixes, "IsTruncated": more, "NextContinuationToken": last}
+
+
+@pytest.fixture(params=[1, 4])
+def pool(request):
+    executor = ThreadPoolExecutor(max_workers=request.param)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+@pytest.mark.parametrize("buffer_pages", [1, 8])
+def test_ordered_walk_yields_every_key_in_order(pool, buffer_pages):
+    lister = listing.KeyspaceLister(pool, buffer_pages=buffer_pages)
+    assert [obj["Key"] for obj in lister.iter_objects(FakeS3(), "b", "p/", ordered=True)] == KEYS
+
+
+@pytest.mark.parametrize("buffer_pages", [1, 8])
+def test_unordered_walk_yields_every_key(pool, buffer_pages):
+    lister = listing.KeyspaceLister(pool, buffer_pages=buffer_pages)
+    assert sorted(obj["Key"] for obj in lister.iter_objects(FakeS3(), "b", "p/")) == KEYS
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_buffer_stays_bounded(monkeypatch, ordered):
+    peak = [0]
+    lock = threading.Lock()
+
+    class Counting(listing._Walk):
+        def emit(self, task, item):
+            super().emit(task, item)
+            with lock:
+                peak[0] = max(peak[0], self.buffered if self.ordered else self.shared.qsize())
+
+    monkeypatch.setattr(listing, "_Walk", Counting)
+    pool = ThreadPoolExecutor(max_workers=4)
+    try:
+        lister = listing.KeyspaceLister(pool, buffer_pages=2)
+        for n, _ in enumerate(lister.iter_objects(FakeS3(), "b", "p/", ordered=ordered)):
+            if n % 500 == 0:
+                threading.Event().wait(0.005)
+    finally:
+        pool.shutdown(wait=True)
+    # The budget, plus one page from each worker that was already listing.
+    assert peak[0] <= 2 + 4
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_early_stop_releases_workers(ordered):
+    pool = ThreadPoolExecutor(max_workers=4)
+    lister = listing.KeyspaceLister(pool, buffer_pages=1)
+    walk = lister.iter_objects(FakeS3(), "b", "p/", ordered=ordered)
+    for _ in zip(range(1500), walk):
+        pass
+    walk.close()
+    # Shutting down waits for every worker, so a worker stuck on a full queue would hang here.
+    pool.shutdown(wait=True)
@@ -0,0 +1,101 @@
+"""Runs against a scratch database on the server named by S3FM_TEST_DB_URL."""
+
+import os
+import uuid
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+import psycopg2.extensions
+
+import migrations
+
+DB_URL = os.getenv("S3FM_TEST_DB_URL", "")
+pytestmark = pytest.mark.skipif(not DB_URL, reason="S3FM_TEST_DB_URL is not set")
+
+
+@pytest.fixture
+def conn():
+    name = f"s3fm_test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(DB_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {name}")
+    db = psycopg2.connect(psycopg2.extensions.make_dsn(DB_URL, dbname=name))
+    try:
+        yield db
+    finally:
+        db.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE {name}")
+        admin.close()
+
+
+def query(conn, sql, args=None):
+    with conn.cursor() as cur:
+        cur.execute(sql, args)
+        rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+def test_fresh_database(conn):
+    assert migrations.migrate(conn) == [number for number, _, _ in migrations.MIGRATIONS]
+    assert query(conn, "SELECT MAX(version) FROM schema_migrations") == [(migrations.LATEST,)]
+    assert migrations.migrate(conn) == []
+
+
+def test_pre_existing_database(conn):
+    # The schema as it was before schema_migrations: app_settings keyed by "id".
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE users (
+              id SERIAL PRIMARY KEY,
+              email TEXT UNIQUE NOT NULL,
+              password_hash TEXT NOT NULL,
+              created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE sessions (
+              id SERIAL PRIMARY KEY,
+              token TEXT UNIQUE NOT NULL,
+              user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+              created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+              expires_at TIMESTAMPTZ NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE TABLE app_settings (id INTEGER PRIMARY KEY, bucket TEXT, aws_access_key TEXT, aws_secret_key TEXT, aws_region TEXT)")
+        cur.execute("INSERT INTO users (email, password_hash) VALUES ('ada@example.com', 'x') RETURNING id")
+        user_id = cur.fetchone()[0]
+        cur.execute("INSERT INTO sessions (token, user_id, expires_at) VALUES ('tok', %s, NOW() + INTERVAL '1 day')", (user_id,))
+        cur.execute("INSERT INTO app_settings (id, bucket) VALUES (%s, 'photos')", (user_id,))
+    conn.commit()
+
+    assert migrations.migrate(conn) == [number for number, _, _ in migrations.MIGRATIONS]
+
+    assert query(conn, "SELECT user_id, bucket FROM app_settings") == [(user_id, "photos")]
+    assert query(conn, "SELECT token FROM sessions") == [("tok",)]
+    constraints = query(
+        conn,
+        "SELECT constraint_name FROM information_schema.table_constraints WHERE table_name = 'app_settings'",
+    )
+    assert ("app_settings_user_id_fkey",) in constraints
+    tables = {row[0] for row in query(conn, "SELECT tablename FROM pg_tables WHERE schemaname = 'public'")}
+    assert {"operations", "session_revocations", "schema_migrations"} <= tables
+    assert migrations.migrate(conn) == []
+
+
+def test_partially_migrated_database(conn):
+    with conn.cursor() as cur:
+        cur.execute("CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW())")
+        for number, name, statements in migrations.MIGRATIONS[:1]:
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (number, name))
+    conn.commit()
+    assert migrations.migrate(conn) == [number for number, _, _ in migrations.MIGRATIONS[1:]]
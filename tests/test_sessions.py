@@ -0,0 +1,100 @@
+import sessions
+
+KEY = sessions.derive_key(b"test-secret")
+EXPIRES = 2_000_000_000
+
+
+def issue(email="ada@example.com", expires=EXPIRES):
+    return sessions.Signer(KEY).issue(7, email, expires)
+
+
+def test_issue_and_verify():
+    token, token_id = issue("ädä@example.com")
+    claims = sessions.Signer(KEY).verify(token, now=EXPIRES - 1)
+    assert claims["id"] == 7
+    assert claims["email"] == "ädä@example.com"
+    assert claims["expires"] == EXPIRES
+    assert claims["token_id"] == token_id
+
+
+def test_tampered_payload_is_rejected():
+    token, _ = issue()
+    payload, _, signature = token.rpartition(".")
+    fields = payload.split(".")
+    fields[1] = "8"
+    assert sessions.Signer(KEY).verify(".".join(fields) + "." + signature, now=0) is None
+
+
+def test_tampered_signature_is_rejected():
+    token, _ = issue()
+    flipped = token[:-1] + ("A" if token[-1] != "A" else "B")
+    assert sessions.Signer(KEY).verify(flipped, now=0) is None
+    assert sessions.Signer(KEY).verify(token + "é", now=0) is None
+
+
+def test_other_key_is_rejected():
+    token, _ = issue()
+    assert sessions.Signer(sessions.derive_key(b"other-secret")).verify(token, now=0) is None
+
+
+def test_malformed_tokens_are_rejected():
+    signer = sessions.Signer(KEY)
+    assert signer.verify("", now=0) is None
+    assert signer.verify("opaque-db-token", now=0) is None
+    payload = "v1.7.1.2.x"
+    assert signer.verify(f"{payload}.{signer._sign(payload)}", now=0) is None
+
+
+def test_expiry_boundary():
+    token, _ = issue()
+    signer = sessions.Signer(KEY)
+    assert signer.verify(token, now=EXPIRES - 1) is not None
+    assert signer.verify(token, now=EXPIRES) is None
+
+
+def claims(issued_ms, token_id="t1", user_id=7):
+    return {"id": user_id, "issued_ms": issued_ms, "token_id": token_id}
+
+
+def test_user_revocation_boundary():
+    revocations = sessions.Revocations(None)
+    revocations.add(7, None, 1000, EXPIRES)
+    assert revocations.revoked(claims(999))
+    # Only tokens issued strictly before the cut-off are revoked.
+    assert not revocations.revoked(claims(1000))
+    assert not revocations.revoked(claims(1001))
+    assert not revocations.revoked(claims(999, user_id=8))
+
+
+def test_user_revocation_keeps_latest_cutoff():
+    revocations = sessions.Revocations(None)
+    revocations.add(7, None, 2000, EXPIRES)
+    revocations.add(7, None, 1000, EXPIRES)
+    assert revocations.revoked(claims(1999))
+
+
+def test_token_revocation():
+    revocations = sessions.Revocations(None)
+    revocations.add(7, "t1", 1000, EXPIRES)
+    assert revocations.revoked(claims(5000, "t1"))
+    assert not revocations.revoked(claims(5000, "t2"))
+
+
+def test_refresh_loads_new_rows_and_drops_expired():
+    rows = [
+        (1, 7, "t1", 1000, EXPIRES),
+        (2, 8, None, 1000, 1),
+    ]
+    seen = []
+
+    def load(after_id):
+        seen.append(after_id)
+        return [row for row in rows if row[0] > after_id]
+
+    revocations = sessions.Revocations(load)
+    assert revocations.refresh() == 2
+    assert revocations.revoked(claims(5000, "t1"))
+    # Row 2 expired long ago, so nothing it could match is still valid.
+    assert not revocations.revoked(claims(999, "t9", user_id=8))
+    assert revocations.refresh() == 0
+    assert seen == [0, 2]